@@ -0,0 +1,169 @@
+# Benchmark de upload e dashboard com dados sintéticos, via Flask test client
+#
+# Uso: python benchmarks/benchmark.py --linhas 10000 100000 1000000 --saida resultado.json
+# Cada tamanho roda num subprocesso próprio (estado e pico de RSS isolados) e o resultado
+# sai em JSON para comparar entre commits.
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+DIRETORIO_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+RAIZ_PROJETO = os.path.dirname(DIRETORIO_BENCHMARKS)
+sys.path.insert(0, DIRETORIO_BENCHMARKS)
+
+from dados_sinteticos import gerar_conjunto
+
+# Ordem de upload dos exports (a mesma usada no dia a dia)
+ORDEM_UPLOAD = ('filiais-regional.csv', 'produtos-estoque.csv', 'vendas-varejo.csv', 'vendas-atacado.csv')
+
+# Consultas do dashboard medidas; cada requisição ignora o cache de respostas
+CONSULTAS_DASHBOARD = {
+    'dashboard': '/dashboard',
+    'dashboard_raw': '/dashboard?format=raw',
+    'dashboard_filtrado': '/dashboard?regiao=Recife&canal=Varejo',
+    'rankings': '/rankings?dimensao=produto&metrica=quantidade&limite=10'
+}
+
+
+def pico_rss_mb():
+    """Pico de memória residente do processo (None se a plataforma não informa)"""
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux informa em KB, macOS em bytes
+        return round(pico / 1024 / (1024 if sys.platform == 'darwin' else 1), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        memoria = psutil.Process().memory_info()
+        return round(getattr(memoria, 'peak_wset', memoria.rss) / 1024 / 1024, 1)
+    except ImportError:
+        return None
+
+
+def percentis(amostras):
+    tempos = np.array(amostras) * 1000
+    return {
+        "n": len(tempos),
+        "p50_ms": round(float(np.percentile(tempos, 50)), 3),
+        "p95_ms": round(float(np.percentile(tempos, 95)), 3),
+        "p99_ms": round(float(np.percentile(tempos, 99)), 3),
+        "max_ms": round(float(tempos.max()), 3)
+    }
+
+
+def commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ_PROJETO,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def medir_tamanho(linhas, dados, repeticoes):
+    """Roda dentro do subprocesso: sobe o servidor num diretório temporário, envia os CSVs e mede"""
+    caminhos = gerar_conjunto(os.path.join(dados, str(linhas)), linhas)
+    os.chdir(tempfile.mkdtemp(prefix='datahub-bench-'))
+    os.environ['DATAHUB_DATASET_DIR'] = os.path.join('uploads', '.datasets')
+    sys.path.insert(0, RAIZ_PROJETO)
+    import server_mvp
+    cliente = server_mvp.app.test_client()
+
+    uploads = {}
+    for nome in ORDEM_UPLOAD:
+        with open(caminhos[nome], 'rb') as arquivo:
+            inicio = time.perf_counter()
+            resposta = cliente.post('/upload?sync=1', data={'file': (arquivo, nome)}, content_type='multipart/form-data')
+            segundos = time.perf_counter() - inicio
+        if resposta.status_code != 200:
+            raise RuntimeError(f"Upload de {nome} falhou: {resposta.status_code} {resposta.get_data(as_text=True)[:300]}")
+        linhas_arquivo = resposta.get_json()['rows']
+        uploads[nome] = {
+            "linhas": linhas_arquivo,
+            "bytes": os.path.getsize(caminhos[nome]),
+            "segundos": round(segundos, 4),
+            "linhas_por_segundo": round(linhas_arquivo / segundos, 1) if segundos > 0 else None
+        }
+
+    consultas = {}
+    for nome, url in CONSULTAS_DASHBOARD.items():
+        amostras = []
+        for _ in range(repeticoes):
+            server_mvp.respostas_cache.clear()
+            inicio = time.perf_counter()
+            resposta = cliente.get(url)
+            amostras.append(time.perf_counter() - inicio)
+            if resposta.status_code != 200:
+                raise RuntimeError(f"{url} falhou: {resposta.status_code} {resposta.get_data(as_text=True)[:300]}")
+        consultas[nome] = {**percentis(amostras), "bytes_resposta": len(resposta.get_data())}
+
+    total_linhas = sum(upload["linhas"] for upload in uploads.values())
+    total_segundos = sum(upload["segundos"] for upload in uploads.values())
+    return {
+        "linhas_vendas": linhas,
+        "upload": {
+            "arquivos": uploads,
+            "linhas": total_linhas,
+            "segundos": round(total_segundos, 4),
+            "linhas_por_segundo": round(total_linhas / total_segundos, 1) if total_segundos > 0 else None
+        },
+        "consultas": consultas,
+        "pico_rss_mb": pico_rss_mb()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de /upload e /dashboard com dados sintéticos')
+    parser.add_argument('--linhas', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help='linhas de vendas por execução (varejo + atacado), ex.: 10000 1000000 10000000')
+    parser.add_argument('--repeticoes', type=int, default=50, help='requisições por consulta do dashboard')
+    parser.add_argument('--dados', default=os.path.join(DIRETORIO_BENCHMARKS, 'dados'),
+                        help='onde os CSVs gerados ficam (reaproveitados entre execuções)')
+    parser.add_argument('--saida', help='arquivo JSON de saída (padrão: stdout)')
+    parser.add_argument('--um-tamanho', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.um_tamanho is not None:
+        # Subprocesso: um único tamanho, resultado em JSON no stdout
+        print(json.dumps(medir_tamanho(args.um_tamanho, os.path.abspath(args.dados), args.repeticoes)))
+        return
+
+    resultados = []
+    for linhas in args.linhas:
+        print(f"Medindo {linhas} linhas...", file=sys.stderr)
+        processo = subprocess.run([sys.executable, os.path.abspath(__file__), '--um-tamanho', str(linhas),
+                                   '--repeticoes', str(args.repeticoes), '--dados', os.path.abspath(args.dados)],
+                                  capture_output=True, text=True)
+        if processo.returncode != 0:
+            print(processo.stderr, file=sys.stderr)
+            resultados.append({"linhas_vendas": linhas, "erro": processo.stderr.strip().splitlines()[-1:]})
+            continue
+        resultados.append(json.loads(processo.stdout.strip().splitlines()[-1]))
+
+    relatorio = {
+        "commit": commit_atual(),
+        "data": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "repeticoes": args.repeticoes,
+        "resultados": resultados
+    }
+    saida = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(saida)
+    else:
+        print(saida)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# Geração de dados sintéticos no formato dos exports reais (separador ';', datas DD/MM/YYYY)
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+CIDADES = [
+    ('São Paulo', 'SP', 'Sudeste'), ('Rio de Janeiro', 'RJ', 'Sudeste'), ('Belo Horizonte', 'MG', 'Sudeste'),
+    ('Curitiba', 'PR', 'Sul'), ('Porto Alegre', 'RS', 'Sul'), ('Florianópolis', 'SC', 'Sul'),
+    ('Salvador', 'BA', 'Nordeste'), ('Recife', 'PE', 'Nordeste'), ('Fortaleza', 'CE', 'Nordeste'),
+    ('Brasília', 'DF', 'Centro-Oeste'), ('Goiânia', 'GO', 'Centro-Oeste'), ('Manaus', 'AM', 'Norte')
+]
+CATEGORIAS = ['Eletrônicos', 'Informática', 'Casa', 'Escritório', 'Esporte', 'Beleza', 'Alimentos', 'Brinquedos']
+VENDEDORES_VAREJO = ['Ana Souza', 'Bruno Lima', 'Carla Dias', 'Diego Cruz', 'Eduarda Melo', 'Felipe Rocha',
+                     'Gabriela Alves', 'Henrique Costa', 'Isabela Nunes', 'João Pereira']
+VENDEDORES_ATACADO = ['Marcos Ribeiro', 'Patrícia Gomes', 'Rafael Martins', 'Sabrina Teixeira', 'Tiago Barros']
+
+# Linhas gravadas por vez: arquivos de milhões de linhas não passam inteiros pela memória
+LINHAS_POR_BLOCO = 500000
+
+
+def quantidade_produtos(linhas_vendas):
+    """Catálogo cresce com o volume de vendas (50 a 200 mil SKUs)"""
+    return int(min(max(linhas_vendas // 100, 50), 200000))
+
+
+def gerar_produtos(n_produtos, rng):
+    ids = np.arange(1, n_produtos + 1)
+    preco_atacado = np.round(rng.lognormal(3.5, 1.0, n_produtos) + 1, 2)
+    margem = np.round(rng.uniform(15, 60, n_produtos), 1)
+    estoque_minimo = rng.integers(5, 50, n_produtos)
+    return pd.DataFrame({
+        'id_produto': [f"P{i:06d}" for i in ids],
+        'nome_produto': [f"Produto {i}" for i in ids],
+        'categoria': rng.choice(CATEGORIAS, n_produtos),
+        'preco_atacado': preco_atacado,
+        'preco_varejo': np.round(preco_atacado * (1 + margem / 100), 2),
+        'margem_varejo': margem,
+        'estoque_atual': rng.integers(0, 300, n_produtos),
+        'estoque_minimo': estoque_minimo,
+        'estoque_maximo': estoque_minimo * 10
+    })
+
+
+def gerar_filiais(rng):
+    return pd.DataFrame({
+        'id_filial': [f"FIL{i:03d}" for i in range(1, len(CIDADES) + 1)],
+        'nome_filial': [f"Loja {cidade}" for cidade, _, _ in CIDADES],
+        'cidade': [cidade for cidade, _, _ in CIDADES],
+        'estado': [estado for _, estado, _ in CIDADES],
+        'regiao': [regiao for _, _, regiao in CIDADES],
+        'gerente_responsavel': [f"Gerente {i}" for i in range(1, len(CIDADES) + 1)],
+        'meta_mensal': np.round(rng.uniform(50000, 500000, len(CIDADES)), 2),
+        'tipo_operacao': rng.choice(['Varejo', 'Atacado', 'Misto'], len(CIDADES))
+    })
+
+
+def gerar_vendas(linhas, produtos, vendedores, coluna_vendedor, atacado, rng, inicio_id=0):
+    """Um bloco de vendas; ~2% sem valor_total e ~1% com devoluções (valor negativo), como nos exports"""
+    # Popularidade dos produtos segue uma cauda longa (poucos campeões, muitos itens raros)
+    pesos = 1.0 / np.arange(1, len(produtos) + 1) ** 0.8
+    escolhidos = rng.choice(len(produtos), linhas, p=pesos / pesos.sum())
+    filiais = rng.integers(0, len(CIDADES), linhas)
+    quantidade = rng.integers(10, 200, linhas) if atacado else rng.integers(1, 10, linhas)
+    coluna_preco = 'preco_atacado' if atacado else 'preco_varejo'
+    preco = produtos[coluna_preco].to_numpy()[escolhidos]
+    valor = np.round(quantidade * preco, 2)
+    valor = np.where(rng.random(linhas) < 0.01, -valor, valor)
+    texto_valor = valor.astype(str).astype(object)
+    texto_valor[rng.random(linhas) < 0.02] = ''
+    dias = rng.integers(0, 366, linhas)
+    datas = (np.datetime64('2024-01-01') + dias).astype('datetime64[D]')
+    return pd.DataFrame({
+        'id_venda': [f"{'A' if atacado else 'V'}{i}" for i in range(inicio_id, inicio_id + linhas)],
+        'data_venda': pd.to_datetime(datas).strftime('%d/%m/%Y'),
+        'id_filial': [f"FIL{i + 1:03d}" for i in filiais],
+        'cidade_filial': np.array([cidade for cidade, _, _ in CIDADES], dtype=object)[filiais],
+        'id_produto': produtos['id_produto'].to_numpy()[escolhidos],
+        'nome_produto': produtos['nome_produto'].to_numpy()[escolhidos],
+        'quantidade': quantidade,
+        'preco_unitario': preco,
+        'valor_total': texto_valor,
+        coluna_vendedor: rng.choice(vendedores, linhas)
+    })
+
+
+def gerar_conjunto(diretorio, linhas, semente=42):
+    """
+    Grava os 4 CSVs em `diretorio` (reaproveita arquivos já gerados com o mesmo tamanho e semente)
+    `linhas` é o total de vendas, dividido entre varejo (80%) e atacado (20%)
+    Retorna {arquivo: caminho}
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    marcador = os.path.join(diretorio, f".gerado-{linhas}-{semente}")
+    caminhos = {nome: os.path.join(diretorio, nome) for nome in
+                ('filiais-regional.csv', 'produtos-estoque.csv', 'vendas-varejo.csv', 'vendas-atacado.csv')}
+    if os.path.exists(marcador) and all(os.path.exists(caminho) for caminho in caminhos.values()):
+        return caminhos
+
+    rng = np.random.default_rng(semente)
+    produtos = gerar_produtos(quantidade_produtos(linhas), rng)
+    gerar_filiais(rng).to_csv(caminhos['filiais-regional.csv'], sep=';', index=False)
+    produtos.to_csv(caminhos['produtos-estoque.csv'], sep=';', index=False)
+
+    linhas_varejo = int(linhas * 0.8)
+    for nome, total, vendedores, coluna, atacado in (
+            ('vendas-varejo.csv', linhas_varejo, VENDEDORES_VAREJO, 'vendedor', False),
+            ('vendas-atacado.csv', linhas - linhas_varejo, VENDEDORES_ATACADO, 'vendedor_responsavel', True)):
+        with open(caminhos[nome], 'w', encoding='utf-8', newline='') as arquivo:
+            for inicio in range(0, max(total, 1), LINHAS_POR_BLOCO):
+                bloco = gerar_vendas(min(LINHAS_POR_BLOCO, total - inicio), produtos, vendedores, coluna, atacado, rng, inicio)
+                bloco.to_csv(arquivo, sep=';', index=False, header=inicio == 0)
+
+    open(marcador, 'w').close()
+    return caminhos
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera CSVs sintéticos de vendas, estoque e filiais')
+    parser.add_argument('linhas', type=int, help='total de linhas de vendas (varejo + atacado)')
+    parser.add_argument('--dir', default=os.path.join('benchmarks', 'dados'), help='diretório de saída')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+    for nome, caminho in gerar_conjunto(os.path.join(args.dir, str(args.linhas)), args.linhas, args.semente).items():
+        print(f"{nome}: {os.path.getsize(caminho) / 1024 / 1024:.1f} MB")
@@ -0,0 +1,90 @@
+# Pico de memória do DataProcessor.process_file em relação ao tamanho dos dados carregados
+#
+# Uso: python benchmarks/memoria_processamento.py --linhas 1000000 --saida memoria.json
+# Cada medição roda num subprocesso novo: um só carrega o arquivo, o outro roda o process_file
+# completo. O excedente do segundo sobre o primeiro, em múltiplos do DataFrame carregado, mostra
+# quantas cópias dos dados a limpeza e as análises mantêm vivas ao mesmo tempo.
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+DIRETORIO_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+RAIZ_PROJETO = os.path.dirname(DIRETORIO_BENCHMARKS)
+sys.path.insert(0, DIRETORIO_BENCHMARKS)
+
+from benchmark import pico_rss_mb, commit_atual
+
+ARQUIVOS = ('vendas-varejo.csv', 'produtos-estoque.csv')
+
+
+def medir(caminho, modo):
+    """Roda dentro do subprocesso; devolve o pico de RSS e o tamanho do DataFrame carregado"""
+    sys.path.insert(0, RAIZ_PROJETO)
+    from processors.data_processor import DataProcessor
+    processador = DataProcessor()
+    base = pico_rss_mb()
+    if modo == 'carga':
+        df = processador._process_csv(caminho)
+        return {"rss_inicial_mb": base, "pico_rss_mb": pico_rss_mb(),
+                "bytes_dataframe": int(df.memory_usage(index=True, deep=True).sum()), "linhas": len(df)}
+    resultado = processador.process_file(caminho, os.path.basename(caminho))
+    if not resultado.get("success"):
+        raise RuntimeError(resultado.get("error"))
+    return {"rss_inicial_mb": base, "pico_rss_mb": pico_rss_mb(), "etapas_limpeza": resultado["cleaning_stages"]}
+
+
+def subprocesso(caminho, modo):
+    processo = subprocess.run([sys.executable, os.path.abspath(__file__), '--medir', caminho, '--modo', modo],
+                              capture_output=True, text=True)
+    if processo.returncode != 0:
+        raise RuntimeError(processo.stderr.strip().splitlines()[-1:])
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pico de memória do process_file com dados sintéticos')
+    parser.add_argument('--linhas', type=int, default=1000000, help='linhas de vendas geradas (varejo + atacado)')
+    parser.add_argument('--dados', default=os.path.join(DIRETORIO_BENCHMARKS, 'dados'),
+                        help='onde os CSVs gerados ficam (reaproveitados entre execuções)')
+    parser.add_argument('--saida', help='arquivo JSON de saída (padrão: stdout)')
+    parser.add_argument('--medir', help=argparse.SUPPRESS)
+    parser.add_argument('--modo', choices=('carga', 'processamento'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        print(json.dumps(medir(args.medir, args.modo)))
+        return
+
+    # A geração roda em outro processo: o Linux herda o pico de RSS do pai nos subprocessos
+    subprocess.run([sys.executable, os.path.join(DIRETORIO_BENCHMARKS, 'dados_sinteticos.py'), str(args.linhas),
+                    '--dir', os.path.abspath(args.dados)], check=True, stdout=subprocess.DEVNULL)
+    diretorio = os.path.join(os.path.abspath(args.dados), str(args.linhas))
+    resultados = {}
+    for nome in ARQUIVOS:
+        print(f"Medindo {nome}...", file=sys.stderr)
+        carga = subprocesso(os.path.join(diretorio, nome), 'carga')
+        processamento = subprocesso(os.path.join(diretorio, nome), 'processamento')
+        megabytes = carga["bytes_dataframe"] / 1024 / 1024
+        resultados[nome] = {
+            "linhas": carga["linhas"],
+            "dataframe_mb": round(megabytes, 1),
+            "pico_carga_mb": carga["pico_rss_mb"],
+            "pico_processamento_mb": processamento["pico_rss_mb"],
+            # Memória além da carga, em cópias do DataFrame (0 = nenhuma cópia extra)
+            "copias_extras": round((processamento["pico_rss_mb"] - carga["pico_rss_mb"]) / megabytes, 2) if megabytes else None,
+            "etapas_limpeza": processamento["etapas_limpeza"]
+        }
+
+    relatorio = {"commit": commit_atual(), "linhas_vendas": args.linhas, "resultados": resultados}
+    saida = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(saida)
+    else:
+        print(saida)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,17 @@ import { useState, useCallback } from 'react';
 import axios from 'axios';
 
 const API_BASE = 'http://localhost:3001';
+const JOB_POLL_INTERVAL = 500;
+
+// Upload is processed in background: poll the job until it finishes
+const waitForJob = async (jobId) => {
+  for (;;) {
+    const { data: job } = await axios.get(`${API_BASE}/jobs/${jobId}`);
+    if (job.status === 'concluido') return job.resultado;
+    if (job.status === 'erro') throw new Error(job.erro);
+    await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+  }
+};
 
 export const useDataUpload = () => {
   const [uploadedFiles, setUploadedFiles] = useState([]);
@@ -33,11 +44,12 @@ export const useDataUpload = () => {
             'Content-Type': 'multipart/form-data',
           },
         });
+        const result = await waitForJob(response.data.job_id);
         
         return {
           name: file.name,
-          rows: response.data.rows,
-          columns: response.data.columns,
+          rows: result.rows,
+          columns: result.columns,
           status: 'success'
         };
       } catch (err) {
@@ -0,0 +1,189 @@
+"""
+Columnar File Storage
+Writes datasets as Arrow IPC (Feather v2) files and maps them back without re-parsing
+"""
+
+import pandas as pd
+import json
+import os
+import pickle
+import tempfile
+from typing import Dict, Any, Optional, Tuple
+import logging
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pa_ipc = None
+
+logger = logging.getLogger(__name__)
+
+ARROW_FORMAT = 'arrow'
+PICKLE_FORMAT = 'pickle'
+
+
+def arrow_available() -> bool:
+    return pa is not None
+
+
+def write_frame(frame: pd.DataFrame, path_without_ext: str) -> Tuple[str, str]:
+    """
+    Persist a DataFrame, preferring uncompressed Arrow IPC so it can be memory-mapped
+    Falls back to pickle when pyarrow is missing or a column mixes incompatible types
+    Returns (path, format)
+    """
+    if pa is not None:
+        path = path_without_ext + '.arrow'
+        try:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            _atomic_write(path, lambda handle: _write_arrow(table, handle))
+            return path, ARROW_FORMAT
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+            logger.warning(f"Arrow cannot represent '{path_without_ext}' ({e}); falling back to pickle")
+    path = path_without_ext + '.pkl'
+    _atomic_write(path, lambda handle: pickle.dump(frame, handle, protocol=pickle.HIGHEST_PROTOCOL))
+    return path, PICKLE_FORMAT
+
+
+def _write_arrow(table, handle):
+    with pa_ipc.new_file(handle, table.schema) as writer:
+        writer.write_table(table)
+
+
+class ArrowChunkWriter:
+    """
+    Appends DataFrame chunks to an uncompressed Arrow IPC file as they are parsed, so a large
+    upload never has to be concatenated in memory; read_frame maps the finished file
+
+    A chunk whose types differ from the file's is cast to them, or the file is rewritten
+    batch by batch with widened types (e.g. int64 -> double). write() returns False when
+    a chunk has no Arrow representation compatible with the file; the caller then keeps
+    the data in memory as before.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.schema = None
+        self._handle = None
+        self._writer = None
+
+    def write(self, frame: pd.DataFrame) -> bool:
+        errors = (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError)
+        try:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+        except errors as e:
+            logger.warning(f"Arrow cannot represent a chunk of '{self.path}' ({e})")
+            return False
+        if self._writer is None:
+            self._open(table.schema)
+        elif not table.schema.equals(self.schema, check_metadata=False):
+            try:
+                table = table.cast(self.schema)
+            except errors:
+                try:
+                    # Pandas metadata describes the first chunk's dtypes; Arrow types alone decide after widening
+                    schema = pa.unify_schemas([self.schema.remove_metadata(), table.schema.remove_metadata()],
+                                              promote_options='permissive')
+                    self._widen(schema)
+                    table = table.cast(schema)
+                except errors as e:
+                    logger.warning(f"Chunk of '{self.path}' does not fit the file's column types ({e})")
+                    return False
+        self._writer.write_table(table)
+        return True
+
+    def _open(self, schema):
+        self.schema = schema
+        self._handle = open(self.path, 'wb')
+        self._writer = pa_ipc.new_file(self._handle, schema)
+
+    def _widen(self, schema):
+        """Rewrite the batches written so far with `schema`, one batch in memory at a time"""
+        self._close()
+        previous = self.path + '.prev'
+        os.replace(self.path, previous)
+        try:
+            with pa.memory_map(previous, 'r') as source:
+                reader = pa_ipc.open_file(source)
+                self._open(schema)
+                for position in range(reader.num_record_batches):
+                    batch = pa.Table.from_batches([reader.get_batch(position)])
+                    self._writer.write_table(batch.cast(schema))
+        finally:
+            os.remove(previous)
+
+    def _close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._handle.close()
+            self._writer = self._handle = None
+
+    def close(self) -> bool:
+        """Finish the file; False if no chunk was written (and there is no file)"""
+        written = self.schema is not None
+        self._close()
+        return written
+
+    def abort(self):
+        self._close()
+        remove_file(self.path)
+
+
+def read_frame(path: str, fmt: str) -> pd.DataFrame:
+    """Load a persisted DataFrame; Arrow files are memory-mapped, not read into RAM up front"""
+    if fmt == ARROW_FORMAT:
+        if pa is None:
+            raise RuntimeError("pyarrow is required to load Arrow datasets")
+        source = pa.memory_map(path, 'r')
+        table = pa_ipc.open_file(source).read_all()
+        # split_blocks keeps one block per column, allowing zero-copy views over the mapping
+        return table.to_pandas(split_blocks=True)
+    with open(path, 'rb') as handle:
+        return pickle.load(handle)
+
+
+def write_pickle(obj: Any, path: str):
+    _atomic_write(path, lambda handle: pickle.dump(obj, handle, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def read_pickle(path: str) -> Optional[Any]:
+    try:
+        with open(path, 'rb') as handle:
+            return pickle.load(handle)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+        logger.warning(f"Could not read '{path}': {e}")
+        return None
+
+
+def write_json(data: Dict[str, Any], path: str):
+    encoded = json.dumps(data, ensure_ascii=False, indent=2, default=str).encode('utf-8')
+    _atomic_write(path, lambda handle: handle.write(encoded))
+
+
+def read_json(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+def remove_file(path: Optional[str]):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def _atomic_write(path: str, write):
+    """Write to a temp file in the same directory and rename, so readers never see half a file"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            write(handle)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
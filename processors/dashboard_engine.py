@@ -0,0 +1,976 @@
+"""
+Vectorized Dashboard Aggregation Engine
+Computes every /dashboard metric with grouped pandas/NumPy operations over typed columns
+"""
+
+import pandas as pd
+import numpy as np
+from collections import OrderedDict
+from pandas.api.types import union_categoricals
+from typing import Dict, List, Any, Tuple, Callable, Optional
+import logging
+
+from processors.date_columns import parse_dates, month_labels, week_labels
+from processors.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# Column roles resolved for every upload (value, region, product, seller, date)
+COLUMN_ROLES = ('valor', 'regiao', 'produto', 'vendedor', 'data')
+
+# Bumped whenever DatasetAggregates changes shape, so persisted aggregates are recomputed
+AGGREGATES_VERSION = 6
+
+# Dimensions of the sales cube that /dashboard can be filtered by
+CUBE_DIMENSIONS = ('regiao', 'produto', 'vendedor', 'canal', 'mes', 'semana')
+# Key of the cube cells. Crossed with the others, products are close to one cell per sale,
+# so they stay out of the key and are answered from each dataset's product_sales instead
+CELL_DIMENSIONS = ('regiao', 'vendedor', 'canal', 'mes', 'semana')
+
+# Metric flags of a sale row: which dashboard sums the row takes part in
+_KPI, _REGION, _SELLER, _DATED, _CHANNEL, _PRODUCT, _ASSIGNED = 1, 2, 4, 8, 16, 32, 64
+# Per cell: (sum column, row count column, flag of the rows behind them)
+CELL_MEASURES = (('vendas', 'transacoes', _KPI), ('regiao_vendas', 'regiao_linhas', _REGION),
+                 ('vendedor_vendas', 'vendedor_linhas', _SELLER), ('mes_vendas', 'mes_linhas', _DATED),
+                 ('canal_total', 'canal_transacoes', _CHANNEL))
+
+# Entities /rankings can rank, and the metrics each one supports
+RANKING_DIMENSIONS = ('produto', 'vendedor', 'regiao', 'filial')
+RANKING_METRICS = ('receita', 'quantidade', 'transacoes', 'ticket')
+
+# Columns that mark inventory/target files, which are not sales
+STOCK_MARKERS = ('estoque_atual', 'estoque_minimo')
+
+
+def _convert_objects(series: pd.Series, convert: Callable, dtype) -> Tuple[np.ndarray, np.ndarray]:
+    """Apply a Python converter once per distinct value instead of once per row"""
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    converted = np.zeros(len(uniques), dtype=dtype)
+    valid = np.zeros(len(uniques), dtype=bool)
+    for i, value in enumerate(uniques):
+        try:
+            converted[i] = convert(value)
+            valid[i] = True
+        except Exception:
+            continue
+    return converted[codes], valid[codes]
+
+
+def to_float(series: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized equivalent of float(value) per cell
+    Returns (values, valid) where valid is False wherever float() would raise
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        return values, np.ones(len(values), dtype=bool)
+    return _convert_objects(series, float, np.float64)
+
+
+def to_int(series: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized equivalent of int(value) per cell (truncates floats, rejects NaN/inf)"""
+    if (pd.api.types.is_integer_dtype(series) or pd.api.types.is_bool_dtype(series)) and not series.hasnans:
+        values = series.to_numpy(dtype=np.int64)
+        return values, np.ones(len(values), dtype=bool)
+    if pd.api.types.is_numeric_dtype(series):
+        floats = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = np.isfinite(floats)
+        return np.trunc(np.where(valid, floats, 0)).astype(np.int64), valid
+    return _convert_objects(series, int, np.int64)
+
+
+def truthy(series: pd.Series) -> np.ndarray:
+    """Python truthiness per cell (NaN counts as true, like bool(float('nan')))"""
+    if pd.api.types.is_bool_dtype(series):
+        return series.to_numpy(dtype=bool)
+    if pd.api.types.is_numeric_dtype(series):
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        return (values != 0) | np.isnan(values)
+    return series.astype(object).to_numpy().astype(bool)
+
+
+def _constant(value, length: int) -> pd.Series:
+    return pd.Series([value] * length, dtype=object)
+
+
+def _keys(frame: pd.DataFrame, column: Optional[str], default) -> pd.Series:
+    """Group keys for a role column, mirroring row.get(column, default)"""
+    if column is None or column not in frame.columns:
+        return _constant(default, len(frame))
+    keys = frame[column]
+    if keys.isna().any():
+        keys = keys.astype(object).where(keys.notna(), default)
+    return keys
+
+
+def _group_sum(keys: pd.Series, values: np.ndarray) -> Dict[Any, float]:
+    """Sum values per key in first-appearance order (NaN propagates like Python's +)"""
+    if len(keys) == 0:
+        return {}
+    codes, uniques = pd.factorize(keys, use_na_sentinel=False)
+    sums = np.bincount(codes, weights=values, minlength=len(uniques))
+    return dict(zip(uniques.tolist(), sums.tolist()))
+
+
+def _group_count(keys: pd.Series, flags: Optional[np.ndarray] = None) -> Dict[Any, int]:
+    """Count true flags (every row without `flags`) per key in first-appearance order"""
+    codes, uniques = pd.factorize(keys, use_na_sentinel=False)
+    weights = flags.astype(np.float64) if flags is not None else None
+    counts = np.bincount(codes, weights=weights, minlength=len(uniques))
+    return dict(zip(uniques.tolist(), counts.astype(np.int64).tolist()))
+
+
+def _ranking_sums(keys: pd.Series, values: np.ndarray) -> Tuple[Dict[Any, float], Dict[Any, int]]:
+    """Revenue and rows per key for the rankings, skipping rows without a value instead of propagating NaN"""
+    known = ~np.isnan(values)
+    return _group_sum(keys, np.where(known, values, 0.0)), _group_count(keys, known)
+
+
+def _cell_ids(keys: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cell id per row for a combination of key columns, numbered in first-appearance order,
+    plus the first row of every cell (factorizing one column at a time so ids never overflow)
+    """
+    cell = np.zeros(len(keys[0]), dtype=np.int64)
+    for values in keys:
+        codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        cell, _ = pd.factorize(cell * len(uniques) + codes)
+    _, first_rows = np.unique(cell, return_index=True)
+    return cell, first_rows
+
+
+def _cell_measures(cell: np.ndarray, flags: np.ndarray, weights: np.ndarray, count: int) -> Dict[str, np.ndarray]:
+    """CELL_MEASURES of `count` cells from the rows mapped to them by `cell`"""
+    measures = {}
+    for total, rows, flag in CELL_MEASURES:
+        mask = (flags & flag) != 0
+        measures[total] = np.bincount(cell[mask], weights=weights[mask], minlength=count)
+        measures[rows] = np.bincount(cell[mask], minlength=count).astype(np.int64)
+    return measures
+
+
+def _merge_cells(cubes: List[pd.DataFrame]) -> Tuple[pd.DataFrame, List[np.ndarray]]:
+    """
+    Roll several cubes up into one (cells with the same key are summed, first appearance first)
+    Returns the merged cube and, per input cube, the merged cell of each of its cells
+    """
+    stacked = pd.concat(cubes, ignore_index=True)
+    cell, first_rows = _cell_ids([stacked[name].to_numpy(dtype=object) for name in CELL_DIMENSIONS])
+    merged = stacked.loc[first_rows, list(CELL_DIMENSIONS)].reset_index(drop=True)
+    count = len(first_rows)
+    for total, rows, _ in CELL_MEASURES:
+        merged[total] = np.bincount(cell, weights=stacked[total].to_numpy(dtype=np.float64), minlength=count)
+        merged[rows] = np.bincount(cell, weights=stacked[rows].to_numpy(dtype=np.float64), minlength=count).astype(np.int64)
+    bounds = np.cumsum([0] + [len(cube) for cube in cubes])
+    return merged, [cell[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _concat_product_sales(parts: List[pd.DataFrame]) -> pd.DataFrame:
+    """One product_sales table from several chunks (product codes re-based on the union of names)"""
+    products = union_categoricals([part['produto'] for part in parts])
+    frame = pd.concat([part.drop(columns='produto') for part in parts], ignore_index=True)
+    frame.insert(1, 'produto', products)
+    return frame
+
+
+def _labels(values) -> np.ndarray:
+    """Filter labels of dimension values (missing values match no filter)"""
+    return np.array([None if pd.isna(value) else str(value) for value in values], dtype=object)
+
+
+def _row_per_key(keys: pd.Series, last: bool = True) -> Tuple[List[Any], np.ndarray]:
+    """Keys in first-appearance order together with the position of their last (or first) row"""
+    codes, uniques = pd.factorize(keys, use_na_sentinel=False)
+    if last:
+        _, from_end = np.unique(codes[::-1], return_index=True)
+        positions = len(codes) - 1 - from_end
+    else:
+        _, positions = np.unique(codes, return_index=True)
+    return uniques.tolist(), positions
+
+
+class DatasetAggregates:
+    """Contribution of a single dataset to every dashboard metric"""
+
+    def __init__(self):
+        self.version = AGGREGATES_VERSION
+        self.total_sales = 0.0
+        self.transactions = 0
+        self.region_sales: Dict[Any, float] = {}
+        self.seller_sales: Dict[Any, float] = {}
+        # Revenue per region/seller/branch without the rows that have no value, and the rows
+        # behind it (the rankings; the *_sales sums keep NaN like the dashboard always has)
+        self.region_revenue: Dict[Any, float] = {}
+        self.seller_revenue: Dict[Any, float] = {}
+        self.branch_revenue: Dict[Any, float] = {}
+        self.region_rows: Dict[Any, int] = {}
+        self.seller_rows: Dict[Any, int] = {}
+        self.branch_rows: Dict[Any, int] = {}
+        self.channels: Dict[str, Dict[str, float]] = {}
+        self.month_sales: Dict[str, float] = {}
+        self.week_sales: Dict[str, float] = {}
+        self.stock_items: Dict[Any, Dict[str, Any]] = OrderedDict()
+        self.stock_value = 0.0
+        self.branch_sales: Dict[Any, float] = {}
+        self.branch_targets: Dict[Any, Dict[str, Any]] = OrderedDict()
+        self.products: Dict[Any, Dict[str, Any]] = {}
+        # Sales rolled up by CELL_DIMENSIONS (one row per distinct combination) and the sale
+        # rows that name a product, pointing at their cell; see _build_cube
+        self.cube: Optional[pd.DataFrame] = None
+        self._product_parts: List[pd.DataFrame] = []
+        self.rows = 0
+
+    @property
+    def product_sales(self) -> Optional[pd.DataFrame]:
+        """Cell, product, value, metric flags, quantity and unit price of every sale naming a product"""
+        if len(self._product_parts) > 1:
+            # Chunks appended while ingesting are joined on first use
+            self._product_parts = [_concat_product_sales(self._product_parts)]
+        return self._product_parts[0] if self._product_parts else None
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the cube and the product sales"""
+        total = 0
+        if self.cube is not None:
+            total += int(self.cube.memory_usage(index=True, deep=True).sum())
+        for part in self._product_parts:
+            total += int(part.memory_usage(index=True, deep=True).sum())
+        return total
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_product_parts'] = [self.product_sales] if self._product_parts else []
+        return state
+
+    def combine(self, later: "DatasetAggregates"):
+        """Fold the aggregates of a later chunk of the same dataset into this one"""
+        self.total_sales += later.total_sales
+        self.transactions += later.transactions
+        self.stock_value += later.stock_value
+        if later.cube is not None:
+            if self.cube is None:
+                self.cube, self._product_parts = later.cube, list(later._product_parts)
+            else:
+                # Cells already seen keep their ids; the later chunk's cells are summed into them
+                self.cube, (_, cells) = _merge_cells([self.cube, later.cube])
+                self._product_parts += [part.assign(celula=cells[part['celula'].to_numpy()].astype(np.int32))
+                                        for part in later._product_parts]
+        self.rows += later.rows
+        for name in DashboardAggregates.SUMMED:
+            sums = getattr(self, name)
+            for key, value in getattr(later, name).items():
+                sums[key] = sums.get(key, 0) + value
+        for key, channel in later.channels.items():
+            merged = self.channels.setdefault(key, {'total': 0, 'transacoes': 0})
+            merged['total'] += channel['total']
+            merged['transacoes'] += channel['transacoes']
+        # Later rows win for inventory snapshots and targets, as in a single pass
+        self.stock_items.update(later.stock_items)
+        self.branch_targets.update(later.branch_targets)
+        for key, product in later.products.items():
+            merged = self.products.get(key)
+            if merged is None:
+                self.products[key] = dict(product)
+                continue
+            merged['total_vendas'] += product['total_vendas']
+            merged['total_quantidade'] += product['total_quantidade']
+            merged['transacoes'] += product['transacoes']
+            if product['preco_positivo'] is not None:
+                merged['preco_positivo'] = product['preco_positivo']
+
+
+def aggregate_dataset(frame: pd.DataFrame, roles: Dict[str, Optional[str]]) -> DatasetAggregates:
+    """
+    Compute one dataset's contribution to the dashboard in a single batch of groupbys
+
+    `roles` are the columns resolved across all uploads (see COLUMN_ROLES). Rows are
+    filtered and grouped exactly as the former per-row calcular_* helpers did.
+    """
+    result = DatasetAggregates()
+    rows = len(frame)
+    result.rows = rows
+    if rows == 0:
+        return result
+
+    columns = set(frame.columns)
+    col_valor, col_regiao = roles.get('valor'), roles.get('regiao')
+    col_produto, col_vendedor, col_data = roles.get('produto'), roles.get('vendedor'), roles.get('data')
+    is_stock = any(marker in columns for marker in STOCK_MARKERS)
+
+    with stage('conversao_valores'):
+        if col_valor in columns:
+            values, valid = to_float(frame[col_valor])
+        else:
+            values, valid = np.zeros(rows), np.ones(rows, dtype=bool)
+        positive = valid & (values > 0)
+
+    if col_valor:
+        # KPIs: only real sales (positive values) outside inventory files
+        if not is_stock:
+            result.total_sales = float(values[positive].sum())
+            result.transactions = int(positive.sum())
+
+        # Sales channels (retail/wholesale) inferred from the seller columns
+        with stage('calcular_canais'):
+            channel = _row_channels(frame)
+            assigned = channel != ''
+            if assigned.any():
+                channel_keys = pd.Series(channel[assigned])
+                counted = positive[assigned]
+                totals = _group_sum(channel_keys, np.where(counted, values[assigned], 0.0))
+                counts = _group_count(channel_keys, counted)
+                for name, total in totals.items():
+                    result.channels[name] = {'total': total, 'transacoes': counts[name]}
+
+        # Sales per branch, matched later against branch targets
+        with stage('calcular_vendas_por_filial'):
+            if 'id_filial' in columns:
+                branch_rows = valid & frame['id_filial'].notna().to_numpy()
+                result.branch_sales = _group_sum(frame['id_filial'][branch_rows], values[branch_rows])
+                result.branch_revenue, result.branch_rows = _ranking_sums(frame['id_filial'][branch_rows],
+                                                                          values[branch_rows])
+
+        with stage('analisar_metas_vs_vendas'):
+            if 'meta_mensal' in columns:
+                targets, target_valid = to_float(frame['meta_mensal'])
+                branch = _keys(frame, 'id_filial', None)[target_valid]
+                cities = _keys(frame, 'cidade', 'N/A')[target_valid]
+                branches, last = _row_per_key(branch.reset_index(drop=True))
+                for key, position in zip(branches, last):
+                    # Files without id_filial register their targets under None
+                    key = None if pd.isna(key) else key
+                    result.branch_targets[key] = {
+                        'meta': float(targets[target_valid][position]),
+                        'cidade': cities.iloc[position]
+                    }
+
+    if col_regiao and col_valor and not is_stock:
+        with stage('calcular_vendas_por_regiao'):
+            regions = _keys(frame, col_regiao, 'Outros')[valid]
+            result.region_sales = _group_sum(regions, values[valid])
+            result.region_revenue, result.region_rows = _ranking_sums(regions, values[valid])
+
+    if col_vendedor and col_valor and col_vendedor in columns:
+        with stage('calcular_vendas_por_vendedor'):
+            sellers = frame[col_vendedor]
+            seller_rows = valid & truthy(sellers) & sellers.notna().to_numpy()
+            result.seller_sales = _group_sum(sellers[seller_rows], values[seller_rows])
+            result.seller_revenue, result.seller_rows = _ranking_sums(sellers[seller_rows], values[seller_rows])
+
+    # Dates are parsed once per chunk; seasonality buckets come from period grouping
+    periods = None
+    if col_data and col_data in columns:
+        with stage('conversao_datas'):
+            dates = parse_dates(frame[col_data])
+            periods = {'mes': month_labels(dates), 'semana': week_labels(dates)}
+    if col_data and col_valor and periods is not None:
+        with stage('calcular_sazonalidade'):
+            result.month_sales = _period_sales(periods['mes'], values, valid)
+            result.week_sales = _period_sales(periods['semana'], values, valid)
+
+    if col_produto and 'estoque_atual' in columns:
+        with stage('analisar_estoque'):
+            _aggregate_stock(frame, col_produto, result)
+
+    if col_produto and col_valor and not is_stock:
+        with stage('calcular_vendas_por_produto'):
+            _aggregate_products(frame, col_produto, values, positive, result)
+
+    if col_valor:
+        with stage('cubo_vendas'):
+            result.cube, product_sales = _build_cube(frame, roles, values, valid, positive, is_stock, periods)
+            if product_sales is not None:
+                result._product_parts = [product_sales]
+
+    return result
+
+
+def _row_channels(frame: pd.DataFrame) -> np.ndarray:
+    """Channel of every row ('' where the row belongs to no channel)"""
+    rows = len(frame)
+    columns = set(frame.columns)
+    retail = truthy(frame['vendedor']) if 'vendedor' in columns else np.zeros(rows, dtype=bool)
+    wholesale = truthy(frame['vendedor_responsavel']) if 'vendedor_responsavel' in columns else np.zeros(rows, dtype=bool)
+    fallback = None if ('estoque_atual' in columns or 'meta_mensal' in columns) else 'Outros'
+    return np.select([retail, wholesale], ['Varejo', 'Atacado'], default=fallback or '')
+
+
+def _period_sales(labels: pd.Series, values: np.ndarray, valid: np.ndarray) -> Dict[str, float]:
+    """Sales per month/week label; rows without a parseable date are left out"""
+    dated = labels.notna().to_numpy()
+    if not dated.any():
+        return {}
+    # A period seen only on rows with unparseable values still shows up, at zero
+    return _group_sum(labels[dated].reset_index(drop=True), np.where(valid[dated], values[dated], 0.0))
+
+
+def _aggregate_stock(frame: pd.DataFrame, col_produto: str, result: DatasetAggregates):
+    """Inventory snapshot per product (last row per product wins) and total stock value"""
+    rows = len(frame)
+    columns = set(frame.columns)
+    current, ok_current = to_int(frame['estoque_atual'])
+    minimum, ok_minimum = to_int(frame['estoque_minimo']) if 'estoque_minimo' in columns else (np.zeros(rows, dtype=np.int64), np.ones(rows, dtype=bool))
+    price, ok_price = to_float(frame['preco_varejo']) if 'preco_varejo' in columns else (np.zeros(rows), np.ones(rows, dtype=bool))
+    margin, ok_margin = to_float(frame['margem_varejo']) if 'margem_varejo' in columns else (np.zeros(rows), np.ones(rows, dtype=bool))
+
+    usable = ok_current & ok_minimum & ok_price & ok_margin
+    if not usable.all():
+        logger.warning(f"Skipping {int((~usable).sum())} inventory rows with non-numeric stock fields")
+
+    names = _keys(frame, col_produto, 'Item')[usable].reset_index(drop=True)
+    current, minimum, price, margin = current[usable], minimum[usable], price[usable], margin[usable]
+    stock_values = current * price
+    result.stock_value = float(stock_values.sum())
+
+    keys, last = _row_per_key(names)
+    for key, position in zip(keys, last):
+        result.stock_items[key] = {
+            'atual': int(current[position]),
+            'minimo': int(minimum[position]),
+            'preco_varejo': float(price[position]),
+            'valor_estoque': float(stock_values[position]),
+            'status': 'CRÍTICO' if current[position] < minimum[position] else 'OK',
+            'margem': float(margin[position])
+        }
+
+
+def _product_rows(frame: pd.DataFrame, col_produto: str, positive: np.ndarray):
+    """
+    Rows that count as product sales, with product codes/names, quantities and unit prices
+    Product names are validated once per distinct value: text, not blank and not 'Item'
+    """
+    rows = len(frame)
+    columns = set(frame.columns)
+    quantity, ok_quantity = to_int(frame['quantidade']) if 'quantidade' in columns else (np.zeros(rows, dtype=np.int64), np.ones(rows, dtype=bool))
+    price, ok_price = to_float(frame['preco_unitario']) if 'preco_unitario' in columns else (np.zeros(rows), np.ones(rows, dtype=bool))
+    product_codes, names = pd.factorize(frame[col_produto], use_na_sentinel=False)
+    names = names.tolist()
+    usable_names = np.array([isinstance(name, str) and name != 'Item' and bool(name.strip()) for name in names], dtype=bool)
+    selected = positive & ok_quantity & ok_price & usable_names[product_codes]
+    return product_codes, names, selected, quantity, price
+
+
+def _aggregate_products(frame: pd.DataFrame, col_produto: str, values: np.ndarray,
+                        positive: np.ndarray, result: DatasetAggregates):
+    """Per-product revenue, quantity, transactions and latest positive unit price"""
+    if col_produto not in frame.columns:
+        return
+    product_codes, names, selected, quantity, price = _product_rows(frame, col_produto, positive)
+    if not selected.any():
+        return
+
+    codes, name_index = pd.factorize(product_codes[selected])
+    groups = len(name_index)
+    totals = np.bincount(codes, weights=values[selected], minlength=groups)
+    quantities = np.bincount(codes, weights=quantity[selected].astype(np.float64), minlength=groups)
+    counts = np.bincount(codes, minlength=groups)
+    prices = price[selected]
+    # Price of each product's first row (NaN included) and of its last row with a positive price
+    _, first_rows = np.unique(codes, return_index=True)
+    priced = prices > 0
+    priced_codes, last_from_end = np.unique(codes[priced][::-1], return_index=True)
+    priced_prices = prices[priced][::-1]
+    last_positive = dict(zip(priced_codes.tolist(), priced_prices[last_from_end].tolist()))
+
+    for code, name_position in enumerate(name_index.tolist()):
+        result.products[names[name_position]] = {
+            'total_vendas': float(totals[code]),
+            'total_quantidade': int(quantities[code]),
+            'transacoes': int(counts[code]),
+            'preco_inicial': float(prices[first_rows[code]]),
+            'preco_positivo': last_positive.get(code)
+        }
+
+
+def _build_cube(frame: pd.DataFrame, roles: Dict[str, Optional[str]], values: np.ndarray,
+                valid: np.ndarray, positive: np.ndarray, is_stock: bool,
+                periods: Optional[Dict[str, pd.Series]]) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+    """
+    Roll the dataset up by region x seller x channel x month x ISO week
+
+    Each cell carries, per dashboard metric, the sum and the number of rows that metric
+    would take from the cell's rows (same filters as aggregate_dataset), so any filter on
+    those dimensions is answered by summing cells instead of rescanning the dataset.
+    Rows naming a product are also kept as a compact table (cell, product code, value,
+    metric flags, quantity, unit price) for per-product slices and product filters.
+    """
+    rows = len(frame)
+    columns = set(frame.columns)
+    col_regiao, col_produto = roles.get('regiao'), roles.get('produto')
+    col_vendedor = roles.get('vendedor')
+    nothing = np.zeros(rows, dtype=bool)
+
+    channel = _row_channels(frame)
+    if periods is None:
+        periods = {'mes': _constant(None, rows), 'semana': _constant(None, rows)}
+    dimensions = {
+        'regiao': _keys(frame, col_regiao, 'Outros'),
+        'vendedor': _keys(frame, col_vendedor, None),
+        'canal': pd.Series(np.where(channel != '', channel, None), dtype=object),
+        'mes': periods['mes'],
+        'semana': periods['semana']
+    }
+
+    # Rows each metric takes into account
+    kpi_rows = positive if not is_stock else nothing
+    region_rows = valid if (col_regiao and not is_stock) else nothing
+    if col_vendedor in columns:
+        sellers = frame[col_vendedor]
+        seller_rows = valid & truthy(sellers) & sellers.notna().to_numpy()
+    else:
+        seller_rows = nothing
+    dated = dimensions['mes'].notna().to_numpy()
+    assigned = channel != ''
+    if col_produto in columns and not is_stock:
+        _, _, product_rows, quantity, price = _product_rows(frame, col_produto, positive)
+    else:
+        product_rows, quantity, price = nothing, np.zeros(rows, dtype=np.int64), np.zeros(rows)
+
+    flags = np.zeros(rows, dtype=np.uint8)
+    for flag, mask in ((_KPI, kpi_rows), (_REGION, region_rows), (_SELLER, seller_rows), (_DATED, dated),
+                       (_CHANNEL, assigned & positive), (_PRODUCT, product_rows), (_ASSIGNED, assigned)):
+        flags[mask] |= flag
+    weights = np.where(valid, values, 0.0)
+
+    # Rows no metric looks at would only add empty cells
+    counted = np.flatnonzero(flags)
+    keys = {name: dimension.to_numpy(dtype=object)[counted] for name, dimension in dimensions.items()}
+    if len(counted):
+        cell, first_rows = _cell_ids(list(keys.values()))
+    else:
+        cell, first_rows = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    cube = pd.DataFrame({name: key[first_rows] for name, key in keys.items()})
+    for column, measure in _cell_measures(cell, flags[counted], weights[counted], len(first_rows)).items():
+        cube[column] = measure
+
+    product_sales = None
+    if col_produto in columns:
+        products = _keys(frame, col_produto, None).to_numpy(dtype=object)[counted]
+        named = ~pd.isna(products)
+        codes, names = pd.factorize(products[named])
+        selected = counted[named]
+        product_sales = pd.DataFrame({
+            'celula': cell[named].astype(np.int32),
+            'produto': pd.Categorical.from_codes(codes, categories=pd.Index(names, dtype=object)),
+            'valor': weights[selected],
+            'sinais': flags[selected],
+            'quantidade': quantity[selected],
+            'preco': price[selected]
+        })
+    return cube, product_sales
+
+
+class _CombinedCube:
+    """
+    Cube cells of every dataset rolled up together, with the merged cell of each dataset's cells
+    Filters compare factorized labels, so each distinct value is converted to text once
+    """
+
+    __slots__ = ('cells', 'mappings', '_codes')
+
+    def __init__(self, partials: List[DatasetAggregates]):
+        cubes = [partial.cube for partial in partials if partial.cube is not None]
+        self.cells, mappings = _merge_cells(cubes)
+        mappings = iter(mappings)
+        self.mappings = [next(mappings) if partial.cube is not None else None for partial in partials]
+        self._codes: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.cells.memory_usage(index=True, deep=True).sum()) + sum(
+            mapping.nbytes for mapping in self.mappings if mapping is not None)
+
+    def selected(self, filters: Dict[str, List[str]]) -> np.ndarray:
+        """Cells matching every filter on CELL_DIMENSIONS"""
+        selected = np.ones(len(self.cells), dtype=bool)
+        for dimension, accepted in filters.items():
+            codes = self._codes.get(dimension)
+            if codes is None:
+                codes, uniques = pd.factorize(self.cells[dimension].to_numpy(dtype=object), use_na_sentinel=False)
+                codes = self._codes[dimension] = (codes, _labels(uniques))
+            selected &= np.isin(codes[1], accepted)[codes[0]]
+        return selected
+
+
+class DashboardAggregates:
+    """
+    Running dashboard metrics maintained across uploads
+
+    Each dataset's DatasetAggregates is added once when it is uploaded and subtracted
+    when it is replaced, so reading the metrics costs O(distinct keys), not O(rows).
+    """
+
+    # Keyed sums that are simply added/subtracted per dataset
+    SUMMED = ('region_sales', 'seller_sales', 'month_sales', 'week_sales', 'branch_sales',
+              'region_revenue', 'seller_revenue', 'branch_revenue',
+              'region_rows', 'seller_rows', 'branch_rows')
+
+    def __init__(self):
+        self.roles: Dict[str, Optional[str]] = {}
+        self._partials: Dict[str, DatasetAggregates] = OrderedDict()
+        self._reset_totals()
+
+    def _reset_totals(self):
+        self.total_sales = 0.0
+        self.transactions = 0
+        self.stock_value = 0.0
+        self._sums: Dict[str, Dict[Any, float]] = {name: {} for name in self.SUMMED}
+        self._channels: Dict[str, Dict[str, float]] = {}
+        self._products: Dict[Any, Dict[str, Any]] = {}
+        # Number of datasets contributing each key, so a key disappears with its last contributor
+        self._refs: Dict[str, Dict[Any, int]] = {name: {} for name in self.SUMMED + ('channels', 'products')}
+        self._stock_items: Dict[Any, Dict[str, Any]] = {}
+        self._branch_targets: Dict[Any, Dict[str, Any]] = {}
+        self._cube: Optional[_CombinedCube] = None
+
+    def __len__(self) -> int:
+        return len(self._partials)
+
+    def copy(self) -> "DashboardAggregates":
+        """
+        Independent copy to apply put/discard to while readers keep using this instance
+        Per-dataset aggregates and the last-wins maps are replaced, never modified, so they are shared
+        """
+        clone = DashboardAggregates.__new__(DashboardAggregates)
+        clone.roles = dict(self.roles)
+        clone._partials = OrderedDict(self._partials)
+        clone.total_sales = self.total_sales
+        clone.transactions = self.transactions
+        clone.stock_value = self.stock_value
+        clone._sums = {name: dict(sums) for name, sums in self._sums.items()}
+        clone._channels = {key: dict(channel) for key, channel in self._channels.items()}
+        clone._products = {key: dict(product) for key, product in self._products.items()}
+        clone._refs = {name: dict(refs) for name, refs in self._refs.items()}
+        clone._stock_items = self._stock_items
+        clone._branch_targets = self._branch_targets
+        clone._cube = self._cube
+        return clone
+
+    def rebuild(self, roles: Dict[str, Optional[str]], partials: Dict[str, DatasetAggregates]):
+        """Start over from a full set of per-dataset aggregates (used when column roles change)"""
+        self.roles = dict(roles)
+        self._partials = OrderedDict()
+        self._reset_totals()
+        for name, partial in partials.items():
+            self._partials[name] = partial
+            self._apply(partial, 1)
+        self._refresh_last_wins(set(self._products))
+
+    def put(self, name: str, partial: DatasetAggregates):
+        """Add a dataset's contribution, subtracting the previous one if the name is being replaced"""
+        touched = set(partial.products)
+        previous = self._partials.get(name)
+        if previous is not None:
+            self._apply(previous, -1)
+            touched.update(previous.products)
+        # Assigning an existing key keeps its position, matching the dataset store order
+        self._partials[name] = partial
+        self._apply(partial, 1)
+        if previous is not None:
+            self._restore_key_order()
+        self._refresh_last_wins(touched)
+
+    def discard(self, name: str):
+        """Remove a dataset's contribution entirely"""
+        previous = self._partials.pop(name, None)
+        if previous is None:
+            return
+        self._apply(previous, -1)
+        self._restore_key_order()
+        self._refresh_last_wins(set(previous.products))
+
+    def _apply(self, partial: DatasetAggregates, sign: int):
+        self._apply_scalar('total_sales', partial, sign)
+        self.transactions += sign * partial.transactions
+        self._apply_scalar('stock_value', partial, sign)
+        for name in self.SUMMED:
+            self._apply_sums(name, getattr(partial, name), sign)
+        for key, channel in partial.channels.items():
+            merged = self._merge_entry('channels', self._channels, key, sign, lambda: {'total': 0, 'transacoes': 0})
+            if merged is not None:
+                merged['total'] += sign * channel['total']
+                merged['transacoes'] += sign * channel['transacoes']
+        for key, product in partial.products.items():
+            merged = self._merge_entry('products', self._products, key, sign,
+                                       lambda: {'total_vendas': 0, 'total_quantidade': 0, 'transacoes': 0})
+            if merged is not None:
+                merged['total_vendas'] += sign * product['total_vendas']
+                merged['total_quantidade'] += sign * product['total_quantidade']
+                merged['transacoes'] += sign * product['transacoes']
+
+    def _merge_entry(self, dimension: str, target: Dict[Any, Dict], key, sign: int, factory: Callable):
+        """Track contributors for a key; returns the entry to update, or None once it is gone"""
+        refs = self._refs[dimension]
+        refs[key] = refs.get(key, 0) + sign
+        if refs[key] <= 0:
+            del refs[key]
+            target.pop(key, None)
+            return None
+        return target.setdefault(key, factory())
+
+    def _apply_scalar(self, name: str, partial: DatasetAggregates, sign: int):
+        value, current = getattr(partial, name), getattr(self, name)
+        if sign < 0 and (np.isnan(value) or np.isnan(current)):
+            # NaN cannot be subtracted back out; re-sum the total from the remaining datasets
+            value = sum(getattr(other, name) for other in self._partials.values() if other is not partial)
+            setattr(self, name, value)
+        else:
+            setattr(self, name, current + sign * value)
+
+    def _apply_sums(self, name: str, source: Dict[Any, float], sign: int):
+        target, refs = self._sums[name], self._refs[name]
+        for key, value in source.items():
+            refs[key] = refs.get(key, 0) + sign
+            if refs[key] <= 0:
+                del refs[key]
+                target.pop(key, None)
+            elif sign < 0 and (np.isnan(value) or np.isnan(target[key])):
+                # NaN cannot be subtracted back out; re-sum the key from the remaining datasets
+                target[key] = self._resum(name, key, source)
+            else:
+                target[key] = target.get(key, 0) + sign * value
+
+    def _restore_key_order(self):
+        """
+        Re-order keys by first appearance across datasets, as a full recomputation would
+        (keys dropped and re-added by a replacement otherwise move to the end; ties in the
+        sorted dashboard lists depend on this order)
+        """
+        for name in self.SUMMED:
+            self._sums[name] = self._ordered(self._sums[name], (getattr(partial, name) for partial in self._partials.values()))
+        self._channels = self._ordered(self._channels, (partial.channels for partial in self._partials.values()))
+        self._products = self._ordered(self._products, (partial.products for partial in self._partials.values()))
+
+    @staticmethod
+    def _ordered(current: Dict[Any, Any], sources) -> Dict[Any, Any]:
+        ordered = {}
+        for source in sources:
+            for key in source:
+                if key not in ordered and key in current:
+                    ordered[key] = current[key]
+        return ordered
+
+    def _resum(self, name: str, key, removed: Dict[Any, float]) -> float:
+        total = 0
+        for partial in self._partials.values():
+            source = getattr(partial, name)
+            if source is not removed and key in source:
+                total += source[key]
+        return total
+
+    def _refresh_last_wins(self, products: set):
+        """Recompute the fields where the latest dataset wins instead of being summed"""
+        self._cube = None
+        self._stock_items = {}
+        self._branch_targets = {}
+        for partial in self._partials.values():
+            self._stock_items.update(partial.stock_items)
+            self._branch_targets.update(partial.branch_targets)
+
+        # Unit price: latest positive price across datasets, else the first one seen
+        for key in products:
+            merged = self._products.get(key)
+            if merged is None:
+                continue
+            initial, latest = None, None
+            for partial in self._partials.values():
+                product = partial.products.get(key)
+                if product is None:
+                    continue
+                if initial is None:
+                    initial = product['preco_inicial']
+                if product['preco_positivo'] is not None:
+                    latest = product['preco_positivo']
+            merged['preco_unitario'] = latest if latest is not None else initial
+
+    def cube(self) -> Optional[_CombinedCube]:
+        """Cells of every dataset's cube rolled up together (built on first use after a change)"""
+        if self._cube is None and any(partial.cube is not None for partial in self._partials.values()):
+            self._cube = _CombinedCube(list(self._partials.values()))
+        return self._cube
+
+    def sales_slice(self, filters: Dict[str, List[str]]) -> Dict[str, Any]:
+        """
+        Sales metrics restricted to rows whose dimensions match `filters`
+        ({dimension: [accepted values]}), computed from cube cells and product sales only
+        """
+        cube = self.cube()
+        if cube is None:
+            return {'total_vendas': 0.0, 'total_transacoes': 0, 'vendas_por_regiao': {}, 'vendas_por_vendedor': {},
+                    'vendas_por_mes': {}, 'vendas_por_semana': {}, 'canais': {}, 'todos_produtos': {}}
+        selected = cube.selected({dimension: accepted for dimension, accepted in filters.items()
+                                  if dimension in CELL_DIMENSIONS})
+        products = filters.get('produto')
+
+        # Product sales of the selected cells, per dataset in upload order
+        sales = []
+        for partial, mapping in zip(self._partials.values(), cube.mappings):
+            frame = partial.product_sales if mapping is not None else None
+            if frame is None:
+                continue
+            codes = frame['produto'].cat.codes.to_numpy()
+            cells = mapping[frame['celula'].to_numpy()]
+            rows = selected[cells]
+            if products is not None:
+                rows &= np.isin(_labels(frame['produto'].cat.categories), products)[codes]
+            sales.append((frame, codes, cells, rows))
+
+        if products is None:
+            cells = cube.cells[selected]
+        else:
+            # Only the product's own rows count, so the cells are summed again from them
+            count = len(cube.cells)
+            measures = {}
+            for total, rows, _ in CELL_MEASURES:
+                measures[total], measures[rows] = np.zeros(count), np.zeros(count, dtype=np.int64)
+            for frame, codes, cell, rows in sales:
+                summed = _cell_measures(cell[rows], frame['sinais'].to_numpy()[rows],
+                                        frame['valor'].to_numpy()[rows], count)
+                for column, values in summed.items():
+                    measures[column] += values
+            # Cells in the order the product's rows first reach them, as in the unfiltered cube
+            reached = np.concatenate([cell[rows] for _, _, cell, rows in sales]) if sales else np.zeros(0, dtype=np.int64)
+            present, first_rows = np.unique(reached, return_index=True)
+            cells = cube.cells[list(CELL_DIMENSIONS)].assign(**measures).iloc[present[np.argsort(first_rows)]]
+
+        def sums(key: str, measure: str, rows: str) -> Dict[Any, float]:
+            used = cells[cells[rows] > 0]
+            return _group_sum(used[key].reset_index(drop=True), used[measure].to_numpy(dtype=np.float64))
+
+        channels = {}
+        used = cells[cells['canal'].notna()]
+        channel_keys = used['canal'].reset_index(drop=True)
+        totals = _group_sum(channel_keys, used['canal_total'].to_numpy(dtype=np.float64))
+        counts = _group_sum(channel_keys, used['canal_transacoes'].to_numpy(dtype=np.float64))
+        for name, total in totals.items():
+            transactions = int(counts[name])
+            channels[name] = {
+                'total': total,
+                'transacoes': transactions,
+                'ticket_medio': total / transactions if transactions > 0 else 0
+            }
+
+        return {
+            'total_vendas': float(cells['vendas'].sum(skipna=False)),
+            'total_transacoes': int(cells['transacoes'].sum()),
+            'vendas_por_regiao': sums('regiao', 'regiao_vendas', 'regiao_linhas'),
+            'vendas_por_vendedor': sums('vendedor', 'vendedor_vendas', 'vendedor_linhas'),
+            'vendas_por_mes': sums('mes', 'mes_vendas', 'mes_linhas'),
+            'vendas_por_semana': sums('semana', 'mes_vendas', 'mes_linhas'),
+            'canais': channels,
+            'todos_produtos': self._slice_products([(frame, codes, rows & ((frame['sinais'].to_numpy() & _PRODUCT) != 0))
+                                                    for frame, codes, _, rows in sales])
+        }
+
+    @staticmethod
+    def _slice_products(sales: List[Tuple[pd.DataFrame, np.ndarray, np.ndarray]]) -> Dict[Any, Dict[str, Any]]:
+        """
+        Per-product totals of the selected product sales (frame, product codes, selected rows per
+        dataset); unit price follows the same last-wins rule as the unfiltered dashboard
+        """
+        totals, quantities, counts, initial, latest = {}, {}, {}, {}, {}
+        for frame, codes, rows in sales:
+            if not rows.any():
+                continue
+            names = frame['produto'].cat.categories
+            codes = codes[rows]
+            present, first_rows = np.unique(codes, return_index=True)
+            # Products in the order they first sold, datasets in upload order
+            order = np.argsort(first_rows, kind='stable')
+            present, first_rows = present[order], first_rows[order]
+            groups = len(names)
+            revenue = np.bincount(codes, weights=frame['valor'].to_numpy()[rows], minlength=groups)
+            quantity = np.bincount(codes, weights=frame['quantidade'].to_numpy(dtype=np.float64)[rows], minlength=groups)
+            transactions = np.bincount(codes, minlength=groups)
+            prices = frame['preco'].to_numpy()[rows]
+            priced = prices > 0
+            priced_codes, from_end = np.unique(codes[priced][::-1], return_index=True)
+            last_positive = dict(zip(priced_codes.tolist(), prices[priced][::-1][from_end].tolist()))
+            for code, first in zip(present.tolist(), first_rows.tolist()):
+                name = names[code]
+                totals[name] = totals.get(name, 0.0) + revenue[code]
+                quantities[name] = quantities.get(name, 0) + int(quantity[code])
+                counts[name] = counts.get(name, 0) + int(transactions[code])
+                initial.setdefault(name, float(prices[first]))
+                if code in last_positive:
+                    latest[name] = last_positive[code]
+
+        return {
+            name: {
+                'total_vendas': float(total),
+                'total_quantidade': quantities[name],
+                'transacoes': counts[name],
+                'preco_unitario': latest.get(name, initial[name])
+            }
+            for name, total in totals.items()
+        }
+
+    def ranking_columns(self, dimension: str) -> Tuple[List[Any], Dict[str, np.ndarray]]:
+        """
+        Entities of a RANKING_DIMENSIONS dimension in first-appearance order, with one array
+        per metric it supports (ticket = revenue / transactions, 0 without transactions)
+        Rows without a value are left out of both revenue and transactions, so they cannot turn
+        an entity's revenue into NaN and push it out of order
+        """
+        if dimension == 'produto':
+            products = self._products
+            names = list(products)
+            columns = {
+                'receita': np.fromiter((p['total_vendas'] for p in products.values()), np.float64, len(names)),
+                'quantidade': np.fromiter((p['total_quantidade'] for p in products.values()), np.int64, len(names)),
+                'transacoes': np.fromiter((p['transacoes'] for p in products.values()), np.int64, len(names))
+            }
+        else:
+            prefix = {'vendedor': 'seller', 'regiao': 'region', 'filial': 'branch'}[dimension]
+            revenue, rows = self._sums[prefix + '_revenue'], self._sums[prefix + '_rows']
+            names = list(revenue)
+            columns = {
+                'receita': np.fromiter(revenue.values(), np.float64, len(names)),
+                'transacoes': np.fromiter((rows.get(name, 0) for name in names), np.int64, len(names))
+            }
+        transactions = columns['transacoes']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            columns['ticket'] = np.where(transactions > 0, columns['receita'] / np.maximum(transactions, 1), 0.0)
+        return names, columns
+
+    def metrics(self, filters: Optional[Dict[str, List[str]]] = None) -> Dict[str, Any]:
+        """
+        Current dashboard metrics, derived from the running totals only
+        With `filters`, sales metrics come from the cube slice; inventory and targets stay global
+        """
+        channels = {}
+        for name, channel in self._channels.items():
+            channels[name] = {
+                'total': channel['total'],
+                'transacoes': channel['transacoes'],
+                'ticket_medio': channel['total'] / channel['transacoes'] if channel['transacoes'] > 0 else 0
+            }
+
+        branch_sales = self._sums['branch_sales']
+        goals = {}
+        for branch, target in self._branch_targets.items():
+            meta = target['meta']
+            sales = branch_sales.get(branch, 0)
+            goals[target['cidade']] = {
+                'meta': meta,
+                'vendas': sales,
+                'percentual': (sales / meta * 100) if meta > 0 else 0,
+                'status': 'ATINGIDA' if sales >= meta else 'NÃO ATINGIDA',
+                'diferenca': sales - meta
+            }
+
+        return {
+            'total_vendas': self.total_sales,
+            'total_transacoes': self.transactions,
+            'valor_estoque': self.stock_value,
+            'vendas_por_regiao': dict(self._sums['region_sales']),
+            'vendas_por_vendedor': dict(self._sums['seller_sales']),
+            'vendas_por_mes': dict(self._sums['month_sales']),
+            'vendas_por_semana': dict(self._sums['week_sales']),
+            'canais': channels,
+            'estoque': dict(self._stock_items),
+            'metas_vs_vendas': goals,
+            'todos_produtos': {key: dict(product) for key, product in self._products.items()},
+            **(self.sales_slice(filters) if filters else {})
+        }
@@ -5,19 +5,61 @@ Handles multi-format data ingestion with intelligent ETL capabilities
 
 import pandas as pd
 import numpy as np
-import json
+import codecs
+import csv
+import io
+import os
 import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Tuple, Callable, Optional, Iterable, Iterator
 import logging
 
+from processors import json_stream
+from processors.derived_fields import DERIVED_FIELDS, DerivedFieldRegistry
+from processors.metrics import STAGE_SECONDS
+
+try:
+    import openpyxl
+except ImportError:  # pragma: no cover - optional dependency
+    openpyxl = None
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - optional dependency
+    psutil = None
+
 logger = logging.getLogger(__name__)
 
+# Separators tried in order of preference (Brazilian exports use ';')
+CSV_SEPARATORS = [';', ',', '\t', '|']
+# Bytes read to choose the CSV dialect; the file itself is then parsed once
+SNIFF_BYTES = 64 * 1024
+BYTE_ORDER_MARKS = [(codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16')]
+# Numbers with a decimal part: 1.234,56 / 1234,56 and 1,234.56 / 1234.56
+COMMA_DECIMAL = re.compile(r'^[-+]?\d+(?:\.\d{3})*,\d+$')
+DOT_DECIMAL = re.compile(r'^[-+]?\d+(?:,\d{3})*\.\d+$')
+
+# Sheets cleaned and analyzed at the same time (reading itself is pure-Python XML parsing, kept sequential);
+# also the most sheets held in memory besides the one being read
+EXCEL_WORKERS = min(4, os.cpu_count() or 1)
+# Streamed worksheet rows are turned into typed columns every EXCEL_CHUNK_ROWS rows
+EXCEL_CHUNK_ROWS = 20000
+# JSON records normalized per DataFrame chunk
+JSON_BATCH_RECORDS = 10000
+
+def _rss_bytes() -> Optional[int]:
+    """Resident memory of this process (None without psutil)"""
+    return psutil.Process().memory_info().rss if psutil is not None else None
+
 class DataProcessor:
     """Advanced data processing with auto-detection and cleaning capabilities"""
     
-    def __init__(self):
-        self.supported_formats = ['.xlsx', '.xls', '.csv', '.json']
+    def __init__(self, derived_fields: Optional[DerivedFieldRegistry] = None):
+        self.derived_fields = derived_fields if derived_fields is not None else DERIVED_FIELDS
+        self.supported_formats = ['.xlsx', '.xls', '.csv', '.json', '.ndjson', '.jsonl']
         self.encoding_attempts = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
     
     def process_file(self, file_path: str, filename: str) -> Dict[str, Any]:
@@ -26,35 +68,40 @@ class DataProcessor:
         Returns processed data summary and metrics
         """
         try:
+            csv_dialect, sheets = None, None
+            
             # Detect and load data based on file extension
             if filename.endswith(('.xlsx', '.xls')):
-                df = self._process_excel(file_path)
+                # Every sheet is its own dataset, cleaned as soon as it is read; the first one also fills the top-level fields
+                sheets = self._map_sheets(self._summarize_dataset, self._iter_excel_sheets(file_path, filename))
+                if not sheets:
+                    raise ValueError("Workbook has no sheets")
+                if len(sheets) > 1:
+                    logger.info(f"Multiple sheets processed: {list(sheets)}")
             elif filename.endswith('.csv'):
-                df = self._process_csv(file_path)
-            elif filename.endswith('.json'):
-                df = self._process_json(file_path)
+                csv_dialect = self._sniff_csv(file_path)
+                df = self._process_csv(file_path, csv_dialect)
+            elif filename.endswith(('.json', '.ndjson', '.jsonl')):
+                df = self._process_json(file_path, filename)
             else:
                 raise ValueError(f"Unsupported format: {filename}")
             
-            # Apply intelligent data cleaning
-            df_cleaned = self._clean_dataframe(df)
-            
-            # Generate analytics and insights
-            analytics = self._generate_analytics(df_cleaned)
+            if sheets is not None:
+                summary = next(iter(sheets.values()))
+            else:
+                summary = self._summarize_dataset(df)
             
             # Prepare response with processed data
             response_data = {
                 "success": True,
                 "filename": filename,
-                "original_rows": len(df),
-                "processed_rows": len(df_cleaned),
-                "columns": len(df_cleaned.columns),
-                "column_info": self._analyze_columns(df_cleaned),
-                "data_types": df_cleaned.dtypes.astype(str).to_dict(),
-                "analytics": analytics,
-                "sample_data": df_cleaned.head(10).to_dict('records'),
+                **summary,
                 "processing_time": datetime.now().isoformat()
             }
+            if csv_dialect is not None:
+                response_data["csv_dialect"] = csv_dialect
+            if sheets is not None and len(sheets) > 1:
+                response_data["sheets"] = sheets
             
             # Convert NaN values to None for JSON serialization
             return self._convert_nan_to_none(response_data)
@@ -67,104 +114,331 @@ class DataProcessor:
                 "filename": filename
             }
     
-    def _process_excel(self, file_path: str) -> pd.DataFrame:
-        """Process Excel files with multiple sheet detection"""
+    def _summarize_dataset(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """Clean one loaded table and describe it for the response"""
+        # Apply intelligent data cleaning
+        cleaning_stages = []
+        df_cleaned = self._clean_dataframe(df, cleaning_stages)
+        
+        # Generate analytics and insights
+        analytics = self._generate_analytics(df_cleaned)
+        
+        return {
+            "original_rows": len(df),
+            "processed_rows": len(df_cleaned),
+            "columns": len(df_cleaned.columns),
+            "column_info": self._analyze_columns(df_cleaned),
+            "data_types": df_cleaned.dtypes.astype(str).to_dict(),
+            "analytics": analytics,
+            "sample_data": df_cleaned.head(10).to_dict('records'),
+            "cleaning_stages": cleaning_stages
+        }
+    
+    def _map_sheets(self, function: Callable, sheets: Iterable[Tuple[str, Any]]) -> Dict[str, Any]:
+        """
+        Apply `function` to every (name, DataFrame) as soon as it is produced, keeping the workbook order
+        Reading waits while EXCEL_WORKERS sheets are in progress, so at most those and the sheet
+        being read are in memory
+        """
+        results, pending = {}, deque()
+        with ThreadPoolExecutor(max_workers=EXCEL_WORKERS, thread_name_prefix='excel') as pool:
+            for name, sheet in sheets:
+                if len(pending) >= EXCEL_WORKERS:
+                    finished, future = pending.popleft()
+                    results[finished] = future.result()
+                pending.append((name, pool.submit(function, sheet)))
+                del sheet
+            for name, future in pending:
+                results[name] = future.result()
+        return results
+    
+    def _process_excel(self, file_path: str, filename: str = None) -> Dict[str, pd.DataFrame]:
+        """Every sheet of the workbook as its own DataFrame (all in memory; process_file streams them instead)"""
+        sheets = dict(self._iter_excel_sheets(file_path, filename))
+        if not sheets:
+            raise ValueError("Workbook has no sheets")
+        return sheets
+    
+    def _iter_excel_sheets(self, file_path: str, filename: str = None) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """
+        Yield (sheet name, DataFrame) one sheet at a time, opening the file once
+        .xlsx is streamed row by row (openpyxl read-only mode) instead of loaded whole
+        """
         try:
-            # Try to read the first sheet
-            df = pd.read_excel(file_path, sheet_name=0)
-            
-            # Check if multiple sheets exist and merge if needed
-            excel_file = pd.ExcelFile(file_path)
-            if len(excel_file.sheet_names) > 1:
-                logger.info(f"Multiple sheets detected: {excel_file.sheet_names}")
-                # For now, use first sheet, but this could be enhanced
-            
-            return df
+            if openpyxl is None or (filename or file_path).endswith('.xls'):
+                with pd.ExcelFile(file_path) as excel_file:
+                    for name in excel_file.sheet_names:
+                        yield name, excel_file.parse(name)
+            else:
+                workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+                try:
+                    for worksheet in workbook.worksheets:
+                        yield worksheet.title, self._read_worksheet(worksheet)
+                finally:
+                    workbook.close()
             
         except Exception as e:
             logger.error(f"Excel processing failed: {str(e)}")
             raise
     
-    def _process_csv(self, file_path: str) -> pd.DataFrame:
-        """Process CSV with intelligent encoding and separator detection"""
-        separators = [';', ',', '\t', '|']  # Try different separators
-        
-        for encoding in self.encoding_attempts:
-            for sep in separators:
-                try:
-                    df = pd.read_csv(file_path, encoding=encoding, sep=sep)
-                    
-                    # Check if we got meaningful columns (more than 1 column)
-                    if len(df.columns) > 1:
-                        logger.info(f"CSV loaded successfully with encoding: {encoding}, separator: '{sep}'")
-                        return df
-                        
-                except (UnicodeDecodeError, pd.errors.EmptyDataError):
-                    continue
-                except Exception as e:
-                    logger.warning(f"CSV processing failed with {encoding} and sep '{sep}': {str(e)}")
-                    continue
+    def _read_worksheet(self, worksheet) -> pd.DataFrame:
+        """Streamed read-only worksheet as a DataFrame (first row is the header, as in pd.read_excel)"""
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        columns = self._excel_columns(header)
+        width = len(columns)
+        
+        # Only EXCEL_CHUNK_ROWS row tuples are alive at a time; each block becomes typed column pieces
+        # and trailing empty rows are dropped like pandas does
+        pieces: List[List[pd.Series]] = [[] for _ in columns]
+        block, blank_run = [], []
+        for row in rows:
+            if len(row) != width:
+                row = (tuple(row) + (None,) * width)[:width]
+            if all(value is None for value in row):
+                blank_run.append(row)
+                continue
+            if blank_run:
+                block.extend(blank_run)
+                blank_run = []
+            block.append(row)
+            if len(block) >= EXCEL_CHUNK_ROWS:
+                self._append_columns(pieces, block, columns)
+                block = []
+        if block or not any(pieces):
+            self._append_columns(pieces, block, columns)
+        
+        # Each column is joined on its own and its pieces released right away, so the sheet
+        # is never held twice (a frame-level concat would copy every column at once)
+        joined = {}
+        for position in range(width):
+            column = pieces[position]
+            joined[position] = column[0] if len(column) == 1 else pd.concat(column, ignore_index=True)
+            pieces[position] = None
+        df = pd.DataFrame(joined, copy=False)
+        df.columns = columns
+        return df
+    
+    def _append_columns(self, pieces: List[List[pd.Series]], block: List[Tuple[Any, ...]], columns: List[Any]):
+        """Type a block of rows like pd.DataFrame does and keep one independent Series per column"""
+        frame = pd.DataFrame(block, columns=range(len(columns)))
+        for position, column in enumerate(pieces):
+            # A copy, so the block's consolidated 2D arrays are freed with `frame`
+            column.append(frame[position].copy())
+    
+    def _excel_columns(self, header: Tuple[Any, ...]) -> List[Any]:
+        """Header names the way pd.read_excel builds them (Unnamed: i, repeated names get .1, .2)"""
+        columns, seen = [], {}
+        for position, name in enumerate(header):
+            name = f"Unnamed: {position}" if name is None else name
+            if name in seen:
+                seen[name] += 1
+                name = f"{name}.{seen[name]}"
+            else:
+                seen[name] = 0
+            columns.append(name)
+        return columns
+    
+    def _process_csv(self, file_path: str, dialect: Dict[str, Any] = None) -> pd.DataFrame:
+        """Parse the whole CSV once, with the dialect picked by _sniff_csv"""
+        dialect = dialect if dialect is not None else self._sniff_csv(file_path)
         
-        # If all separators failed, try with default comma
         try:
-            df = pd.read_csv(file_path, encoding='utf-8')
-            logger.warning("Falling back to default CSV reading")
-            return df
-        except Exception as e:
-            raise ValueError(f"Could not decode CSV file with any supported encoding/separator: {str(e)}")
+            df = self._read_csv(file_path, dialect)
+        except UnicodeDecodeError as e:
+            # The sniffed prefix decoded cleanly but a later byte did not: one retry with the next encoding
+            later = self.encoding_attempts[self.encoding_attempts.index(dialect['encoding']) + 1:] \
+                if dialect['encoding'] in self.encoding_attempts else []
+            if not later:
+                raise ValueError(f"Could not decode CSV file as {dialect['encoding']}: {str(e)}")
+            logger.warning(f"CSV is not {dialect['encoding']} past the sniffed prefix, re-reading as {later[0]}")
+            dialect['encoding'] = later[0]
+            df = self._read_csv(file_path, dialect)
+        except pd.errors.ParserError as e:
+            raise ValueError(f"Could not parse CSV file with separator '{dialect['separator']}': {str(e)}")
+        
+        logger.info(f"CSV loaded with encoding: {dialect['encoding']}, separator: '{dialect['separator']}', "
+                    f"decimal: '{dialect['decimal']}'")
+        return df
+    
+    def _read_csv(self, file_path: str, dialect: Dict[str, Any]) -> pd.DataFrame:
+        options = {}
+        if dialect.get('trailing_delimiter'):
+            # Otherwise pandas takes the first column as the index, or fails when only some rows end with the delimiter
+            options = {"index_col": False, "usecols": range(dialect['header_fields'])}
+        return pd.read_csv(file_path, encoding=dialect['encoding'], sep=dialect['separator'],
+                           quotechar=dialect['quotechar'], decimal=dialect['decimal'],
+                           thousands=dialect['thousands'], **options)
+    
+    def _sniff_csv(self, file_path: str) -> Dict[str, Any]:
+        """
+        Pick encoding, separator, quote character and decimal/thousands convention
+        from the first SNIFF_BYTES of the file (read once)
+        """
+        with open(file_path, 'rb') as f:
+            raw = f.read(SNIFF_BYTES + 1)
+        complete = len(raw) <= SNIFF_BYTES
+        encoding, text = self._sniff_encoding(raw[:SNIFF_BYTES], complete)
+        if not text.strip():
+            raise ValueError("CSV file is empty")
+        
+        # Single quotes only count as quoting when double quotes never appear
+        quotechar = "'" if '"' not in text and re.search(r"(^|[;,\t|])'", text, re.MULTILINE) else '"'
+        
+        separator, records = ',', []
+        for sep in CSV_SEPARATORS:
+            rows = [row for row in csv.reader(io.StringIO(text, newline=''), delimiter=sep, quotechar=quotechar) if row]
+            if not complete and len(rows) > 1:
+                # The last record may be cut by the prefix boundary
+                rows = rows[:-1]
+            # A meaningful split has more than one column and no row wider than the header,
+            # except by one empty field when exports end data rows with the delimiter
+            fields = len(rows[0]) if rows else 0
+            if fields > 1 and all(len(row) <= fields or (len(row) == fields + 1 and not row[-1].strip())
+                                  for row in rows[1:]):
+                separator, records, width = sep, rows, fields
+                trailing_delimiter = any(len(row) > width for row in rows[1:])
+                break
+        else:
+            width, trailing_delimiter = 1, False
+            logger.warning("No separator produced more than one column, falling back to ','")
+        
+        decimal, thousands = self._sniff_number_format(records[1:], separator)
+        return {
+            "encoding": encoding,
+            "separator": separator,
+            "quotechar": quotechar,
+            "decimal": decimal,
+            "thousands": thousands,
+            "header_fields": width,
+            "trailing_delimiter": trailing_delimiter,
+            "sniffed_bytes": min(len(raw), SNIFF_BYTES)
+        }
     
-    def _process_json(self, file_path: str) -> pd.DataFrame:
-        """Process JSON with nested structure flattening"""
+    def _sniff_encoding(self, raw: bytes, complete: bool) -> Tuple[str, str]:
+        """First encoding that decodes the prefix (a multi-byte character cut at its end is fine)"""
+        for bom, encoding in BYTE_ORDER_MARKS:
+            if raw.startswith(bom):
+                return encoding, codecs.getincrementaldecoder(encoding)().decode(raw, final=complete)
+        
+        for encoding in self.encoding_attempts:
+            try:
+                return encoding, codecs.getincrementaldecoder(encoding)().decode(raw, final=complete)
+            except UnicodeDecodeError:
+                continue
+        raise ValueError(f"Could not decode CSV file with any supported encoding: {self.encoding_attempts}")
+    
+    def _sniff_number_format(self, rows: List[List[str]], separator: str) -> Tuple[str, Any]:
+        """Decimal and thousands separators voted by the fields that look like decimal numbers"""
+        comma_fields, dot_fields = [], []
+        for row in rows:
+            for field in row:
+                field = field.strip()
+                if COMMA_DECIMAL.match(field):
+                    comma_fields.append(field)
+                elif DOT_DECIMAL.match(field):
+                    dot_fields.append(field)
+        
+        if separator != ',' and len(comma_fields) > len(dot_fields):
+            # Thousands separator only when the sample shows grouped digits (1.234,56)
+            return ',', '.' if any('.' in field for field in comma_fields) else None
+        return '.', ',' if separator != ',' and any(',' in field for field in dot_fields) else None
+    
+    def _process_json(self, file_path: str, filename: str = None) -> pd.DataFrame:
+        """
+        Process JSON or NDJSON with nested structure flattening
+        Records are read incrementally and normalized JSON_BATCH_RECORDS at a time
+        """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            ndjson = True if (filename or file_path).lower().endswith(json_stream.NDJSON_EXTENSIONS) else None
+            records = json_stream.iter_records(file_path, ndjson=ndjson)
             
-            # Handle different JSON structures
-            if isinstance(data, list):
-                df = pd.json_normalize(data)
-            elif isinstance(data, dict):
-                # Try to find the main data array
-                for key, value in data.items():
-                    if isinstance(value, list) and len(value) > 0:
-                        df = pd.json_normalize(value)
-                        break
-                else:
-                    # Single record
-                    df = pd.json_normalize([data])
-            else:
-                raise ValueError("Unsupported JSON structure")
-            
-            return df
+            # Columnar chunks instead of the whole document as Python objects
+            chunks = [pd.json_normalize(batch) for batch in json_stream.batched(records, JSON_BATCH_RECORDS)]
+            if not chunks:
+                return pd.DataFrame()
+            return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
             
         except Exception as e:
             logger.error(f"JSON processing failed: {str(e)}")
             raise
     
-    def _clean_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Apply intelligent data cleaning operations"""
-        df_clean = df.copy()
+    def _clean_dataframe(self, df: pd.DataFrame, report: List[Dict[str, Any]] = None) -> pd.DataFrame:
+        """
+        Apply intelligent data cleaning operations
+        
+        Stages never copy the whole frame: they replace the columns they change on a shallow
+        copy and re-select rows only when some are dropped, so the input is left untouched
+        and unchanged columns stay shared with it. Time and memory of each stage go to `report`.
+        """
+        report = report if report is not None else []
         
         # Remove completely empty rows and columns
-        df_clean = df_clean.dropna(how='all').dropna(axis=1, how='all')
+        df = self._run_stage('drop_empty', self._drop_empty, df, report)
         
         # Clean column names
-        df_clean.columns = [self._clean_column_name(col) for col in df_clean.columns]
+        df = self._run_stage('clean_column_names', self._clean_column_names, df, report)
         
         # Auto-detect and convert data types
-        df_clean = self._auto_convert_types(df_clean)
+        df = self._run_stage('convert_types', self._auto_convert_types, df, report)
         
         # Add calculated fields for inventory management
-        df_clean = self._add_calculated_fields(df_clean)
+        df = self._run_stage('calculated_fields', self._add_calculated_fields, df, report)
         
         # Remove duplicate rows
-        initial_rows = len(df_clean)
-        df_clean = df_clean.drop_duplicates()
-        duplicates_removed = initial_rows - len(df_clean)
-        
-        if duplicates_removed > 0:
-            logger.info(f"Removed {duplicates_removed} duplicate rows")
+        df = self._run_stage('drop_duplicates', self._drop_duplicates, df, report)
         
-        return df_clean
+        return df
+    
+    def _run_stage(self, name: str, stage: Callable[[pd.DataFrame], pd.DataFrame], df: pd.DataFrame,
+                   report: List[Dict[str, Any]]) -> pd.DataFrame:
+        """Run one cleaning stage, recording its duration, output size and resident memory growth"""
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        result = stage(df)
+        seconds = time.perf_counter() - started
+        STAGE_SECONDS.observe(seconds, 'clean_' + name)
+        rss_after = _rss_bytes()
+        report.append({
+            "stage": name,
+            "seconds": round(seconds, 4),
+            "rows": len(result),
+            "columns": len(result.columns),
+            # Shallow size: string columns count their buffers (Arrow) or pointers (object)
+            "frame_bytes": int(result.memory_usage(index=True, deep=False).sum()),
+            "rss_delta_bytes": rss_after - rss_before if rss_before is not None else None
+        })
+        return result
+    
+    def _drop_empty(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Rows and columns without any value, found column by column (no whole-frame mask)"""
+        row_has_value = np.zeros(len(df), dtype=bool)
+        keep_columns = []
+        for position in range(df.shape[1]):
+            present = df.iloc[:, position].notna().to_numpy()
+            if present.any():
+                keep_columns.append(position)
+                row_has_value |= present
+        
+        if len(keep_columns) == df.shape[1] and row_has_value.all():
+            return df
+        if row_has_value.all():
+            return df.iloc[:, keep_columns]
+        return df.iloc[row_has_value, keep_columns]
+    
+    def _clean_column_names(self, df: pd.DataFrame) -> pd.DataFrame:
+        df = df.copy(deep=False)
+        df.columns = [self._clean_column_name(col) for col in df.columns]
+        return df
+    
+    def _drop_duplicates(self, df: pd.DataFrame) -> pd.DataFrame:
+        duplicated = df.duplicated().to_numpy()
+        if not duplicated.any():
+            return df
+        logger.info(f"Removed {int(duplicated.sum())} duplicate rows")
+        return df[~duplicated]
     
     def _clean_column_name(self, col_name: str) -> str:
         """Clean and standardize column names"""
@@ -190,8 +464,8 @@ class DataProcessor:
         return clean_name
     
     def _auto_convert_types(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Intelligent data type conversion"""
-        df_converted = df.copy()
+        """Intelligent data type conversion (converted columns are replaced, the rest stay shared)"""
+        df_converted = df.copy(deep=False)
         
         for col in df_converted.columns:
             # Skip if already numeric
@@ -364,39 +638,8 @@ class DataProcessor:
         return patterns
     
     def _add_calculated_fields(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Add calculated fields based on business logic"""
-        df_calc = df.copy()
-        
-        # Calculate status_estoque dynamically for inventory data
-        if all(col in df_calc.columns for col in ['estoque_atual', 'estoque_minimo']):
-            def calculate_status_estoque(row):
-                if pd.isna(row['estoque_atual']) or pd.isna(row['estoque_minimo']):
-                    return 'DESCONHECIDO'
-                
-                estoque_atual = row['estoque_atual']
-                estoque_minimo = row['estoque_minimo']
-                
-                if estoque_atual <= estoque_minimo:
-                    return 'CRITICO'
-                elif estoque_atual <= estoque_minimo * 1.5:
-                    return 'BAIXO'
-                else:
-                    return 'OK'
-            
-            df_calc['status_estoque_calculado'] = df_calc.apply(calculate_status_estoque, axis=1)
-            logger.info("Campo 'status_estoque_calculado' adicionado baseado na lógica de negócio")
-        
-        # Calculate margem percentual if we have price data
-        if all(col in df_calc.columns for col in ['preco_varejo', 'preco_atacado']):
-            df_calc['margem_real_percentual'] = ((df_calc['preco_varejo'] - df_calc['preco_atacado']) / df_calc['preco_atacado'] * 100).round(2)
-            logger.info("Campo 'margem_real_percentual' calculado automaticamente")
-        
-        # Calculate percentage of stock if we have estoque data
-        if all(col in df_calc.columns for col in ['estoque_atual', 'estoque_minimo', 'estoque_maximo']):
-            df_calc['percentual_estoque'] = (df_calc['estoque_atual'] / df_calc['estoque_maximo'] * 100).round(1)
-            logger.info("Campos de análise de estoque calculados automaticamente")
-        
-        return df_calc
+        """Add calculated fields based on business logic (see processors.derived_fields)"""
+        return self.derived_fields.apply(df)
     
     def _convert_nan_to_none(self, obj):
         """Convert NaN values to None for JSON serialization"""
@@ -0,0 +1,237 @@
+"""
+Raw Data Query Engine
+Per-column indexes built at upload time, used to filter, sort and page through a dataset
+without scanning it
+"""
+
+import pandas as pd
+import numpy as np
+import base64
+import json
+from typing import Dict, List, Any, Tuple, Optional
+import logging
+
+from processors.date_columns import parse_dates
+
+logger = logging.getLogger(__name__)
+
+# Range operators accepted as `<column>__<op>=value`
+RANGE_OPERATORS = ('gt', 'gte', 'lt', 'lte')
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class QueryError(ValueError):
+    """Invalid /data query (unknown column, bad value or stale cursor)"""
+
+
+class ColumnIndex:
+    """
+    Dictionary-encoded sorted index over one column
+
+    The distinct values are kept sorted (hash lookup for equality, binary search for ranges)
+    and `order` lists row positions grouped by value, so every value or range of values maps
+    to a contiguous slice of `order`. Missing values sort last and never match a filter.
+    """
+
+    def __init__(self, series: pd.Series, is_date: bool = False):
+        self.is_date = is_date
+        keys = parse_dates(series) if is_date else series
+        codes, self.uniques = pd.factorize(keys, sort=True)
+        codes = codes.astype(np.int64)
+        codes[codes < 0] = len(self.uniques)
+        # Stable sort keeps rows with the same value in upload order
+        self.order = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes, minlength=len(self.uniques) + 1)
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+        self.valid = int(self.offsets[len(self.uniques)])
+        self._sequences: Dict[bool, Tuple[np.ndarray, np.ndarray]] = {}
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.order.nbytes + self.offsets.nbytes)
+
+    def coerce(self, raw: str):
+        """Convert a query-string value into this column's domain"""
+        if self.is_date or pd.api.types.is_datetime64_any_dtype(self.uniques.dtype):
+            value = parse_dates(pd.Series([raw], dtype=object))[0]
+            if pd.isna(value):
+                raise QueryError(f"Data inválida: {raw}")
+            return value
+        if pd.api.types.is_bool_dtype(self.uniques.dtype):
+            return raw.lower() in ('1', 'true', 'sim')
+        if pd.api.types.is_numeric_dtype(self.uniques.dtype):
+            try:
+                return float(raw)
+            except ValueError:
+                raise QueryError(f"Valor numérico inválido: {raw}")
+        return raw
+
+    def equal(self, raw_values: List[str]) -> np.ndarray:
+        """Row positions (ascending) whose value is any of `raw_values`"""
+        keys = [self.coerce(raw) for raw in raw_values]
+        codes = self.uniques.get_indexer(keys)
+        runs = [self.order[self.offsets[code]:self.offsets[code + 1]] for code in codes if code >= 0]
+        if not runs:
+            return np.empty(0, dtype=np.int64)
+        return runs[0] if len(runs) == 1 else np.sort(np.concatenate(runs))
+
+    def between(self, bounds: Dict[str, str]) -> np.ndarray:
+        """Row positions (ascending) inside the range given by gt/gte/lt/lte"""
+        low, high = 0, len(self.uniques)
+        for op, raw in bounds.items():
+            key = self.coerce(raw)
+            if op in ('gt', 'gte'):
+                low = max(low, int(self.uniques.searchsorted(key, side='right' if op == 'gt' else 'left')))
+            else:
+                high = min(high, int(self.uniques.searchsorted(key, side='left' if op == 'lt' else 'right')))
+        if low >= high:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(self.order[self.offsets[low]:self.offsets[high]])
+
+    def sequence(self, descending: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Row positions in sort order plus each row's rank in that order
+        Missing values stay last in both directions; built on first use per direction
+        """
+        if descending not in self._sequences:
+            order = self.order
+            if descending:
+                # Reverse the value runs but keep rows of equal value in upload order
+                codes = np.repeat(np.arange(len(self.uniques) + 1), np.diff(self.offsets))
+                codes = np.where(codes < len(self.uniques), len(self.uniques) - 1 - codes, codes)
+                order = order[np.argsort(codes, kind='stable')]
+            rank = np.empty(len(order), dtype=np.int64)
+            rank[order] = np.arange(len(order))
+            self._sequences[descending] = (order, rank)
+        return self._sequences[descending]
+
+
+class DatasetIndex:
+    """Column indexes of one dataset; columns missing an index are indexed on first use"""
+
+    def __init__(self, frame: pd.DataFrame, date_columns: Optional[List[str]] = None, build: bool = True):
+        self.rows = len(frame)
+        self.date_columns = set(column for column in (date_columns or []) if column)
+        self._frame = frame
+        self._columns: Dict[str, ColumnIndex] = {}
+        if build:
+            for column in frame.columns:
+                self.column(column)
+
+    def column(self, name: str) -> ColumnIndex:
+        index = self._columns.get(name)
+        if index is None:
+            index = ColumnIndex(self._frame[name], is_date=name in self.date_columns)
+            self._columns[name] = index
+        return index
+
+    @property
+    def nbytes(self) -> int:
+        return sum(index.nbytes for index in self._columns.values())
+
+
+def encode_cursor(token: str, sort: Optional[str], key: int) -> str:
+    payload = json.dumps([token, sort, key]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, Optional[str], int]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        token, sort, key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return token, sort, int(key)
+    except (ValueError, TypeError):
+        raise QueryError("Cursor inválido")
+
+
+def parse_filters(params: Dict[str, List[str]], columns: List[str]) -> Tuple[Dict[str, List[str]], Dict[str, Dict[str, str]]]:
+    """Split query parameters into equality filters and range filters, validating column names"""
+    equals, ranges = {}, {}
+    for name, values in params.items():
+        column, _, op = name.rpartition('__')
+        if op in RANGE_OPERATORS and column in columns:
+            ranges.setdefault(column, {})[op] = values[-1]
+        elif name in columns:
+            equals[name] = values
+        else:
+            raise QueryError(f"Coluna desconhecida: {name}")
+    return equals, ranges
+
+
+def query_dataset(frame: pd.DataFrame, index: DatasetIndex, token: str,
+                  columns: Optional[List[str]] = None,
+                  equals: Optional[Dict[str, List[str]]] = None,
+                  ranges: Optional[Dict[str, Dict[str, str]]] = None,
+                  sort: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                  cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    One page of rows matching every filter, in `sort` order ('-col' for descending)
+
+    Filters are answered from the indexes and intersected, so the cost depends on the
+    number of matching rows rather than on the dataset size. Pages are keyed by the rank
+    of the last row returned (keyset pagination), so they stay stable while paging.
+    """
+    columns = columns or frame.columns.tolist()
+    unknown = [column for column in columns if column not in frame.columns]
+    if unknown:
+        raise QueryError(f"Colunas desconhecidas: {unknown}")
+    sort_column = sort.lstrip('-') if sort else None
+    if sort_column is not None and sort_column not in frame.columns:
+        raise QueryError(f"Coluna de ordenação desconhecida: {sort_column}")
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+    after = -1
+    if cursor:
+        cursor_token, cursor_sort, after = decode_cursor(cursor)
+        if cursor_token != token or cursor_sort != sort:
+            raise QueryError("Cursor expirado: o arquivo foi substituído ou a ordenação mudou")
+
+    # Candidate rows: intersection of the (ascending) matches of every filter, smallest first
+    matches = [index.column(column).equal(values) for column, values in (equals or {}).items()]
+    matches += [index.column(column).between(bounds) for column, bounds in (ranges or {}).items()]
+    candidates = None
+    for rows in sorted(matches, key=len):
+        candidates = rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+        if not len(candidates):
+            break
+
+    if sort_column is None:
+        if candidates is None:
+            total = index.rows
+            page = np.arange(after + 1, min(after + 1 + limit, index.rows))
+            more = after + 1 + limit < index.rows
+        else:
+            total = len(candidates)
+            start = int(np.searchsorted(candidates, after, side='right'))
+            page = candidates[start:start + limit]
+            more = start + limit < len(candidates)
+        keys = page
+    else:
+        order, rank = index.column(sort_column).sequence(descending=sort.startswith('-'))
+        if candidates is None:
+            total = index.rows
+            page = order[after + 1:after + 1 + limit]
+            keys = np.arange(after + 1, after + 1 + len(page))
+            more = after + 1 + limit < index.rows
+        else:
+            total = len(candidates)
+            ranks = rank[candidates]
+            ranks = ranks[ranks > after]
+            more = len(ranks) > limit
+            if more:
+                # Only the next page needs to be sorted, not every match
+                ranks = np.partition(ranks, limit - 1)[:limit]
+            keys = np.sort(ranks)
+            page = order[keys]
+
+    records = frame.iloc[page][columns]
+    records = records.astype(object).where(records.notna(), None).to_dict('records')
+    return {
+        "total": total,
+        "linhas": records,
+        "colunas": columns,
+        "limite": limit,
+        "proximo_cursor": encode_cursor(token, sort, int(keys[-1])) if more and len(keys) else None
+    }
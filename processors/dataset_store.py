@@ -0,0 +1,669 @@
+"""
+Columnar Dataset Store
+Keeps every uploaded file as a typed DataFrame instead of a list of row dicts,
+optionally persisted as memory-mappable Arrow files with a small JSON catalog
+that several worker processes can share
+"""
+
+import pandas as pd
+import copy
+import hashlib
+import os
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Dict, List, Any, Iterable, Iterator, Tuple, Optional, Callable, Mapping
+import logging
+
+from processors import columnar_files
+from processors.data_query import DatasetIndex
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: locking is per process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILE = 'catalog.json'
+LOCK_FILE = '.lock'
+
+
+def _utc_now() -> datetime:
+    # Last-Modified is written as GMT; naive local times would be off by the UTC offset
+    return datetime.now(timezone.utc)
+
+
+def _parse_modified_at(value: Optional[str]) -> datetime:
+    """Catalog timestamp as aware UTC (catalogs written before were naive local time)"""
+    if not value:
+        return _utc_now()
+    moment = datetime.fromisoformat(value)
+    return moment if moment.tzinfo is not None else moment.astimezone(timezone.utc)
+
+
+def _same_second(first: datetime, second: datetime) -> bool:
+    return first.replace(microsecond=0) == second.replace(microsecond=0)
+
+
+class StoredDataset:
+    """A single uploaded file held in columnar form"""
+
+    def __init__(self, name: str, frame: Optional[pd.DataFrame], roles: Optional[Dict[str, Optional[str]]] = None):
+        self.name = name
+        self._frame = frame
+        # Identifies this version of the dataset across processes (a re-upload gets a new token)
+        self.token = uuid.uuid4().hex
+        # SHA-256 of the uploaded file, used to recognize re-uploads of the same export
+        self.content_hash: Optional[str] = None
+        self.upload_time = datetime.now().isoformat()
+        # Column roles (value/region/product/seller/date) detected from the schema at upload time
+        self.detected_roles: Dict[str, Optional[str]] = dict(roles or {})
+        self.role_overrides: Dict[str, Optional[str]] = {}
+        # On-disk copy (set when the store persists datasets, or when the frame is spilled)
+        self.path: Optional[str] = None
+        self.format: Optional[str] = None
+        self.spilled = False
+        # Dashboard aggregates computed for this file and the resolved roles they were computed with
+        self.aggregates = None
+        self.aggregate_roles: Optional[Dict[str, Optional[str]]] = None
+        # Column indexes for /data (built at upload; restored datasets index columns on first query)
+        self._index: Optional[DatasetIndex] = None
+        # Memory accounting of the owning store (see FrameCache)
+        self._cache: Optional["FrameCache"] = None
+        if frame is not None:
+            self.rows = len(frame)
+            self.column_names = frame.columns.tolist()
+            # deep=True walks object columns once; cache it instead of paying on every /status
+            self.memory_bytes = int(frame.memory_usage(index=True, deep=True).sum())
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """The data itself; datasets restored from disk or spilled are memory-mapped on access"""
+        frame = self._frame
+        if frame is None:
+            frame = columnar_files.read_frame(self.path, self.format)
+            self._frame = frame
+            logger.info(f"Dataset '{self.name}' mapped from {self.path}")
+            if self._cache is not None:
+                self._cache.loaded(self)
+        elif self._cache is not None:
+            self._cache.touched(self)
+        return frame
+
+    def evolve(self, **fields) -> "StoredDataset":
+        """
+        Copy of this version with some metadata changed (roles, aggregates)
+        Published snapshots are never modified; the frame, token and files are shared with the copy
+        """
+        dataset = copy.copy(self)
+        for field, value in fields.items():
+            setattr(dataset, field, value)
+        return dataset
+
+    def unload(self):
+        """Drop the in-memory frame (and the indexes over it); the on-disk copy stays"""
+        self._frame = None
+        self._index = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._frame is not None
+
+    @property
+    def index(self) -> DatasetIndex:
+        if self._index is None:
+            self._index = DatasetIndex(self.frame, [self.roles.get('data')], build=False)
+        return self._index
+
+    @property
+    def roles(self) -> Dict[str, Optional[str]]:
+        """Effective role map: detected roles with manual overrides applied on top"""
+        roles = dict(self.detected_roles)
+        roles.update(self.role_overrides)
+        return roles
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Metadata exposed by /status; cached per data generation, so only fields that
+        change with a new generation belong here (see residency for the rest)
+        """
+        return {
+            "rows": self.rows,
+            "columns": len(self.column_names),
+            "column_names": self.column_names,
+            "upload_time": self.upload_time,
+            "memory_bytes": self.memory_bytes,
+            "memory_mb": round(self.memory_bytes / 1024 / 1024, 2),
+            "roles": self.roles,
+            "persisted": self.path is not None and not self.spilled
+        }
+
+    def residency(self) -> Dict[str, Any]:
+        """Memory state that changes without a new generation (spills, remaps, lazy indexes)"""
+        return {
+            "loaded": self.loaded,
+            "spilled": self.spilled,
+            "index_bytes": self._index.nbytes if self._index is not None else 0
+        }
+
+    def catalog_entry(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "token": self.token,
+            "content_hash": self.content_hash,
+            "path": os.path.basename(self.path) if self.path else None,
+            "format": self.format,
+            "rows": self.rows,
+            "column_names": self.column_names,
+            "memory_bytes": self.memory_bytes,
+            "upload_time": self.upload_time,
+            "detected_roles": self.detected_roles,
+            "role_overrides": self.role_overrides,
+            "aggregate_roles": self.aggregate_roles
+        }
+
+    @classmethod
+    def from_catalog(cls, entry: Dict[str, Any], directory: str) -> "StoredDataset":
+        """Rebuild a dataset from its catalog entry without touching the data file"""
+        dataset = cls(entry['name'], None, entry.get('detected_roles'))
+        dataset.token = entry.get('token', dataset.token)
+        dataset.content_hash = entry.get('content_hash')
+        dataset.role_overrides = entry.get('role_overrides') or {}
+        dataset.upload_time = entry.get('upload_time', dataset.upload_time)
+        dataset.rows = entry['rows']
+        dataset.column_names = entry['column_names']
+        dataset.memory_bytes = entry.get('memory_bytes', 0)
+        dataset.path = os.path.join(directory, entry['path'])
+        dataset.format = entry['format']
+        dataset.aggregate_roles = entry.get('aggregate_roles')
+        return dataset
+
+
+class FrameCache:
+    """
+    LRU accounting of the DataFrames held in memory, under an optional byte budget
+
+    When the loaded datasets exceed the budget, the least recently used ones are spilled:
+    written to disk as Arrow if they have no on-disk copy yet, then dropped from memory.
+    The next access maps them back (StoredDataset.frame), counted as a miss.
+    Dashboard aggregates always stay in memory, so their size is taken from the budget first.
+    """
+
+    def __init__(self, budget_bytes: Optional[int] = None, spill: Optional[Callable[[StoredDataset], None]] = None):
+        self.budget_bytes = budget_bytes or None
+        self._spill = spill
+        self._resident: "OrderedDict[str, StoredDataset]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.aggregate_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.spills = 0
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(dataset.memory_bytes for dataset in self._resident.values())
+
+    def admit(self, dataset: StoredDataset):
+        """A dataset just built in memory (an upload)"""
+        with self._lock:
+            self._resident[dataset.token] = dataset
+        self._enforce(dataset)
+
+    def touched(self, dataset: StoredDataset):
+        with self._lock:
+            self.hits += 1
+            if dataset.token in self._resident:
+                self._resident.move_to_end(dataset.token)
+            else:
+                self._resident[dataset.token] = dataset
+
+    def loaded(self, dataset: StoredDataset):
+        with self._lock:
+            self.misses += 1
+            self._resident[dataset.token] = dataset
+            self._resident.move_to_end(dataset.token)
+        self._enforce(dataset)
+
+    def replace(self, dataset: StoredDataset):
+        """A new version of a resident dataset (same token) takes its place in the LRU order"""
+        with self._lock:
+            if dataset.token in self._resident:
+                self._resident[dataset.token] = dataset
+
+    def forget(self, dataset: StoredDataset):
+        with self._lock:
+            self._resident.pop(dataset.token, None)
+
+    def aggregates_changed(self, datasets: Iterable[StoredDataset]):
+        """Account for the dashboard aggregates of the current datasets"""
+        self.aggregate_bytes = sum(getattr(dataset.aggregates, 'nbytes', 0) for dataset in datasets)
+        self._enforce(None)
+
+    def _enforce(self, current: Optional[StoredDataset]):
+        """Spill least recently used datasets until the loaded ones fit the budget"""
+        if self.budget_bytes is None:
+            return
+        while True:
+            with self._lock:
+                if self.resident_bytes + self.aggregate_bytes <= self.budget_bytes or not self._resident:
+                    return
+                token, victim = next(iter(self._resident.items()))
+                if victim is current and len(self._resident) > 1:
+                    # The dataset being accessed goes last; it is only spilled if it alone is too big
+                    self._resident.move_to_end(token)
+                    continue
+                del self._resident[token]
+                self.spills += 1
+            if self._spill is not None:
+                self._spill(victim)
+            victim.unload()
+            logger.info(f"Dataset '{victim.name}' spilled ({victim.memory_bytes} bytes, budget {self.budget_bytes})")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "budget_bytes": self.budget_bytes,
+            "resident_bytes": self.resident_bytes,
+            "aggregate_bytes": self.aggregate_bytes,
+            "resident_datasets": len(self._resident),
+            "hits": self.hits,
+            "misses": self.misses,
+            "spills": self.spills
+        }
+
+
+class StoreSnapshot:
+    """
+    Immutable view of the store: the datasets of one generation, in upload order
+
+    Mutations never change a published snapshot; they publish a new one, and the datasets in
+    it are replaced (StoredDataset.evolve) rather than modified. A reader holding a snapshot
+    can iterate it while uploads run, without locks.
+    """
+
+    __slots__ = ('datasets', 'generation', 'modified_at', 'epoch', 'shares_second')
+
+    def __init__(self, datasets: Dict[str, StoredDataset], generation: int, modified_at: datetime,
+                 epoch: str, shares_second: bool = False):
+        # Upload order matters: column detection and previews walk files in this order
+        self.datasets: Mapping[str, StoredDataset] = MappingProxyType(dict(datasets))
+        self.generation = generation
+        self.modified_at = modified_at
+        # Generations count from 0 in every store; the epoch tells stores (and restarts) apart
+        self.epoch = epoch
+        # Published in the same second as the previous generation, so Last-Modified
+        # (one-second precision) cannot tell the two apart
+        self.shares_second = shares_second
+
+    def get(self, name: str) -> StoredDataset:
+        return self.datasets[name]
+
+    def find_by_content(self, content_hash: Optional[str]) -> Optional[StoredDataset]:
+        """Dataset uploaded from a file with this content hash, if any"""
+        if content_hash is None:
+            return None
+        for dataset in self.datasets.values():
+            if dataset.content_hash == content_hash:
+                return dataset
+        return None
+
+    def role_maps(self) -> List[Dict[str, Optional[str]]]:
+        """Effective role map of every dataset, in upload order"""
+        return [dataset.roles for dataset in self.datasets.values()]
+
+    def names(self) -> List[str]:
+        return list(self.datasets.keys())
+
+    def items(self) -> Iterator[Tuple[str, StoredDataset]]:
+        return iter(self.datasets.items())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.datasets
+
+    def __len__(self) -> int:
+        return len(self.datasets)
+
+    def total_rows(self) -> int:
+        return sum(dataset.rows for dataset in self.datasets.values())
+
+    def total_memory_bytes(self) -> int:
+        return sum(dataset.memory_bytes for dataset in self.datasets.values())
+
+    def preview(self, limit: int = 5) -> List[Dict[str, Any]]:
+        """First rows across all datasets in upload order, without materializing the rest"""
+        records = []
+        for dataset in self.datasets.values():
+            if len(records) >= limit:
+                break
+            records.extend(dataset.frame.head(limit - len(records)).to_dict('records'))
+        return records
+
+
+class DatasetStore:
+    """
+    Ordered collection of uploaded datasets, keyed by filename
+
+    With `persist_dir`, every dataset is also written as an Arrow IPC file and listed
+    in a JSON catalog, so a restarted server maps the files back instead of re-parsing CSVs.
+    The catalog is also how worker processes share uploads: mutations run under an
+    exclusive file lock on top of the latest catalog, and readers call sync() to pick up
+    what other workers wrote (a single stat() when nothing changed).
+
+    With `memory_budget` (bytes), loaded frames are kept under that size by spilling the
+    least recently used datasets to disk (see FrameCache).
+
+    Reads go through an immutable StoreSnapshot: mutations build the next set of datasets
+    under the exclusive lock and publish it with a single reference swap, so readers never
+    block behind uploads and never see a half-applied change.
+    """
+
+    def __init__(self, persist_dir: Optional[str] = None, memory_budget: Optional[int] = None):
+        self._snapshot = StoreSnapshot({}, 0, _utc_now(), uuid.uuid4().hex[:12])
+        self.persist_dir = persist_dir
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_handle = None
+        self._catalog_stamp = None
+        self._reload_listeners: List[Callable[[], None]] = []
+        self.cache = FrameCache(memory_budget, spill=self._spill)
+        # Spill files of datasets that have no persisted copy (created on first spill, removed at exit)
+        self._spill_dir: Optional[tempfile.TemporaryDirectory] = None
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+            self.sync()
+
+    @property
+    def generation(self) -> int:
+        """Monotonic data version: bumps on every add/remove so responses can be revalidated cheaply"""
+        return self._snapshot.generation
+
+    @property
+    def modified_at(self) -> datetime:
+        return self._snapshot.modified_at
+
+    def snapshot(self) -> "StoreSnapshot":
+        """The current datasets; take one per request when reading more than one thing"""
+        return self._snapshot
+
+    def _publish(self, datasets: Dict[str, StoredDataset], bump: bool = True):
+        """Make `datasets` the current version (callers hold the exclusive lock)"""
+        current = self._snapshot
+        if bump:
+            now = _utc_now()
+            self._snapshot = StoreSnapshot(datasets, current.generation + 1, now, current.epoch,
+                                           _same_second(now, current.modified_at))
+        else:
+            self._snapshot = StoreSnapshot(datasets, current.generation, current.modified_at, current.epoch,
+                                           current.shares_second)
+        self._save_catalog()
+        self.cache.aggregates_changed(datasets.values())
+
+    def _replaced(self, dataset: StoredDataset) -> "OrderedDict[str, StoredDataset]":
+        """Current datasets with a new version of one of them, keeping its position"""
+        datasets = OrderedDict(self._snapshot.datasets)
+        datasets[dataset.name] = dataset
+        self.cache.replace(dataset)
+        return datasets
+
+    # Cross-process coordination
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Serialize mutations across threads and worker processes (re-entrant)
+        The catalog is re-read on entry so changes build on what other workers published
+        """
+        with self._lock:
+            self._lock_depth += 1
+            try:
+                if self._lock_depth == 1 and self.persist_dir:
+                    self._lock_handle = open(os.path.join(self.persist_dir, LOCK_FILE), 'a+')
+                    if fcntl is not None:
+                        fcntl.flock(self._lock_handle.fileno(), fcntl.LOCK_EX)
+                    self.sync()
+                yield self
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and self._lock_handle is not None:
+                    if fcntl is not None:
+                        fcntl.flock(self._lock_handle.fileno(), fcntl.LOCK_UN)
+                    self._lock_handle.close()
+                    self._lock_handle = None
+
+    def _catalog_path(self) -> str:
+        return os.path.join(self.persist_dir, CATALOG_FILE)
+
+    def _stat_catalog(self):
+        try:
+            stat = os.stat(self._catalog_path())
+        except FileNotFoundError:
+            return None
+        # Catalog writes are atomic renames, so the inode changes on every publish
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def on_reload(self, callback: Callable[[], None]):
+        """Register a callback run after the store picked up another process's changes"""
+        self._reload_listeners.append(callback)
+
+    def sync(self) -> bool:
+        """Pick up catalog changes published by other processes; True when anything changed"""
+        if not self.persist_dir or self._stat_catalog() == self._catalog_stamp:
+            return False
+        with self._lock:
+            stamp = self._stat_catalog()
+            if stamp is None or stamp == self._catalog_stamp:
+                return False
+            catalog = columnar_files.read_json(self._catalog_path())
+            self._catalog_stamp = stamp
+            if catalog is None:
+                return False
+            self._apply_catalog(catalog)
+            for callback in self._reload_listeners:
+                callback()
+        return True
+
+    # Persistence
+
+    def _file_stem(self, name: str) -> str:
+        digest = hashlib.sha1(name.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.persist_dir, digest)
+
+    def _aggregates_path(self, name: str) -> str:
+        return self._file_stem(name) + '.agg.pkl'
+
+    def _apply_catalog(self, catalog: Dict[str, Any]):
+        """Replace the in-memory view with the catalog, keeping already mapped frames"""
+        previous = self._snapshot.datasets
+        datasets = OrderedDict()
+        for entry in catalog.get('datasets', []):
+            current = previous.get(entry['name'])
+            if current is not None and current.token == entry.get('token'):
+                dataset = current.evolve(detected_roles=entry.get('detected_roles') or {},
+                                         role_overrides=entry.get('role_overrides') or {})
+                if dataset.roles.get('data') != current.roles.get('data'):
+                    dataset._index = None
+                self.cache.replace(dataset)
+            else:
+                dataset = StoredDataset.from_catalog(entry, self.persist_dir)
+                if not os.path.exists(dataset.path):
+                    logger.warning(f"Dataset file missing for '{dataset.name}': {dataset.path}")
+                    continue
+                dataset._cache = self.cache
+            if dataset.aggregates is None or dataset.aggregate_roles != entry.get('aggregate_roles'):
+                dataset.aggregate_roles = entry.get('aggregate_roles')
+                dataset.aggregates = None
+                if dataset.aggregate_roles is not None:
+                    dataset.aggregates = columnar_files.read_pickle(self._aggregates_path(dataset.name))
+            datasets[dataset.name] = dataset
+        for name, dataset in previous.items():
+            if name not in datasets or datasets[name].token != dataset.token:
+                self.cache.forget(dataset)
+        # Workers sharing the catalog share its epoch; catalogs written before epochs existed
+        # keep this process's own until the next publish saves it
+        self._snapshot = StoreSnapshot(datasets, catalog.get('generation', 0),
+                                       _parse_modified_at(catalog.get('modified_at')),
+                                       catalog.get('epoch') or self._snapshot.epoch,
+                                       bool(catalog.get('shares_second', False)))
+        self.cache.aggregates_changed(datasets.values())
+        logger.info(f"Catalog synced from {self.persist_dir}: {len(datasets)} datasets, generation {self.generation}")
+
+    def _save_catalog(self):
+        if not self.persist_dir:
+            return
+        snapshot = self._snapshot
+        columnar_files.write_json({
+            "epoch": snapshot.epoch,
+            "generation": snapshot.generation,
+            "modified_at": snapshot.modified_at.isoformat(),
+            "shares_second": snapshot.shares_second,
+            "datasets": [dataset.catalog_entry() for dataset in snapshot.datasets.values()]
+        }, self._catalog_path())
+        # Our own publish is already applied; don't re-read it on the next sync()
+        self._catalog_stamp = self._stat_catalog()
+
+    def _persist_aggregates(self, dataset: StoredDataset):
+        path = self._aggregates_path(dataset.name)
+        if dataset.aggregates is None:
+            columnar_files.remove_file(path)
+        else:
+            columnar_files.write_pickle(dataset.aggregates, path)
+
+    def _delete_files(self, dataset: StoredDataset):
+        self.cache.forget(dataset)
+        # Without persistence the path, if any, is a spill file
+        columnar_files.remove_file(dataset.path)
+        if self.persist_dir:
+            columnar_files.remove_file(self._aggregates_path(dataset.name))
+
+    def _spill_directory(self) -> str:
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.TemporaryDirectory(prefix='datahub-spill-')
+        return self._spill_dir.name
+
+    def _spill(self, dataset: StoredDataset):
+        """Make sure an evicted dataset can be mapped back: persisted datasets already can"""
+        if dataset.path is not None or dataset._frame is None:
+            return
+        dataset.path, dataset.format = columnar_files.write_frame(dataset._frame, os.path.join(self._spill_directory(), dataset.token))
+        dataset.spilled = True
+
+    def staging_path(self, extension: str = '.arrow') -> str:
+        """
+        Where to write a data file before add(..., data_file=...) adopts it: a temporary
+        name next to the persisted files (or the spill files), so adopting it is a rename
+        """
+        directory = self.persist_dir or self._spill_directory()
+        return os.path.join(directory, f".tmp-{uuid.uuid4().hex}{extension}")
+
+    # Mutations
+
+    def add(self, name: str, frame: pd.DataFrame, roles: Optional[Dict[str, Optional[str]]] = None,
+            aggregates=None, aggregate_roles: Optional[Dict[str, Optional[str]]] = None,
+            index: Optional[DatasetIndex] = None, content_hash: Optional[str] = None,
+            data_file: Optional[Tuple[str, str]] = None) -> StoredDataset:
+        """
+        Store (or replace) a dataset; a replaced file keeps its original position
+        `data_file` (path from staging_path, format) is a copy of `frame` already on disk,
+        e.g. written while ingesting; it is moved into place instead of writing the frame again
+        """
+        dataset = StoredDataset(name, frame, roles)
+        dataset._index = index
+        dataset.content_hash = content_hash
+        dataset.aggregates = aggregates
+        dataset.aggregate_roles = dict(aggregate_roles) if aggregate_roles is not None else None
+        with self.exclusive():
+            datasets = OrderedDict(self._snapshot.datasets)
+            previous = datasets.get(name)
+            if data_file is not None:
+                staged, dataset.format = data_file
+                # Without persistence the file is kept as the dataset's spill file
+                stem = self._file_stem(name) if self.persist_dir else os.path.join(self._spill_directory(), dataset.token)
+                dataset.path = stem + os.path.splitext(staged)[1]
+                dataset.spilled = not self.persist_dir
+                os.replace(staged, dataset.path)
+            elif self.persist_dir:
+                dataset.path, dataset.format = columnar_files.write_frame(frame, self._file_stem(name))
+            if self.persist_dir:
+                self._persist_aggregates(dataset)
+            if previous is not None:
+                self.cache.forget(previous)
+                if previous.path != dataset.path:
+                    columnar_files.remove_file(previous.path)
+            dataset._cache = self.cache
+            datasets[name] = dataset
+            self._publish(datasets)
+        self.cache.admit(dataset)
+        logger.info(f"Dataset '{name}' stored: {dataset.rows} rows, {dataset.memory_bytes} bytes")
+        return dataset
+
+    def set_aggregates(self, name: str, aggregates, aggregate_roles: Dict[str, Optional[str]]):
+        """Remember a dataset's dashboard aggregates so a restart does not recompute them"""
+        with self.exclusive():
+            dataset = self._snapshot.get(name).evolve(aggregates=aggregates, aggregate_roles=dict(aggregate_roles))
+            if self.persist_dir:
+                self._persist_aggregates(dataset)
+            # Same data, same generation: cached responses stay valid
+            self._publish(self._replaced(dataset), bump=False)
+
+    def set_role_overrides(self, name: str, overrides: Dict[str, Optional[str]]):
+        """Replace the manual role overrides of a dataset"""
+        with self.exclusive():
+            current = self._snapshot.get(name)
+            unknown = [column for column in overrides.values() if column is not None and column not in current.column_names]
+            if unknown:
+                raise KeyError(f"Unknown columns for '{name}': {unknown}")
+            dataset = current.evolve(role_overrides=dict(overrides))
+            if dataset.roles.get('data') != current.roles.get('data'):
+                # The date column is indexed by parsed date, not by its text
+                dataset._index = None
+            self._publish(self._replaced(dataset))
+
+    def remove(self, name: str) -> StoredDataset:
+        with self.exclusive():
+            datasets = OrderedDict(self._snapshot.datasets)
+            dataset = datasets.pop(name)
+            self._delete_files(dataset)
+            self._publish(datasets)
+        return dataset
+
+    def clear(self):
+        with self.exclusive():
+            for dataset in self._snapshot.datasets.values():
+                self._delete_files(dataset)
+            self._publish({})
+
+    # Reads (each one consistent on its own; use snapshot() to combine several)
+
+    def get(self, name: str) -> StoredDataset:
+        return self._snapshot.get(name)
+
+    def find_by_content(self, content_hash: Optional[str]) -> Optional[StoredDataset]:
+        return self._snapshot.find_by_content(content_hash)
+
+    def role_maps(self) -> List[Dict[str, Optional[str]]]:
+        return self._snapshot.role_maps()
+
+    def names(self) -> List[str]:
+        return self._snapshot.names()
+
+    def items(self) -> Iterator[Tuple[str, StoredDataset]]:
+        return self._snapshot.items()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._snapshot
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    def total_rows(self) -> int:
+        return self._snapshot.total_rows()
+
+    def total_memory_bytes(self) -> int:
+        return self._snapshot.total_memory_bytes()
+
+    def preview(self, limit: int = 5) -> List[Dict[str, Any]]:
+        return self._snapshot.preview(limit)
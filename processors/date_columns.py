@@ -0,0 +1,92 @@
+"""
+Date Column Parsing
+Parses date columns once into datetime64 (format inferred from a sample) and buckets them
+into months and weeks without per-row Python string handling
+"""
+
+import pandas as pd
+import numpy as np
+from typing import Callable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Candidate formats, Brazilian day-first first: an ambiguous sample (all days <= 12) is read as DD/MM
+DATE_FORMATS = (
+    '%d/%m/%Y',
+    '%d/%m/%Y %H:%M:%S',
+    '%d/%m/%Y %H:%M',
+    '%Y-%m-%d',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%d-%m-%Y',
+    '%d.%m.%Y',
+    '%d/%m/%y',
+)
+
+# Distinct values tried against every candidate format
+SAMPLE_SIZE = 200
+
+
+def infer_date_format(series: pd.Series, sample_size: int = SAMPLE_SIZE) -> Optional[str]:
+    """Format that parses most of a sample of the column's distinct values (None if none does)"""
+    values = series.dropna()
+    sample = values.head(sample_size * 10).astype('string').str.strip().drop_duplicates().head(sample_size)
+    if sample.empty:
+        return None
+    best, best_hits = None, 0
+    for fmt in DATE_FORMATS:
+        hits = int(pd.to_datetime(sample, format=fmt, errors='coerce').notna().sum())
+        if hits > best_hits:
+            best, best_hits = fmt, hits
+            if hits == len(sample):
+                break
+    return best
+
+
+def parse_dates(series: pd.Series) -> pd.Series:
+    """
+    The column as datetime64 (NaT where a value is not a date)
+
+    The whole column is converted with the inferred explicit format; values it rejects
+    (e.g. ISO dates mixed into a DD/MM/YYYY export) get their own inferred format.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    # Exports repeat the same few hundred dates: convert each distinct value once
+    codes, uniques = pd.factorize(series.astype('string').str.strip())
+    text = pd.Series(uniques, dtype=object)
+    parsed = pd.Series(pd.NaT, index=text.index, dtype='datetime64[ns]')
+    pending = pd.Series(True, index=text.index)
+    tried = set()
+    while pending.any():
+        fmt = infer_date_format(text[pending])
+        if fmt is None or fmt in tried:
+            break
+        tried.add(fmt)
+        parsed[pending] = pd.to_datetime(text[pending], format=fmt, errors='coerce')
+        pending &= parsed.isna()
+    if pending.any():
+        logger.debug(f"{int(pending.sum())} distinct values of '{series.name}' are not dates")
+    values = np.append(parsed.to_numpy(), np.datetime64('NaT', 'ns'))
+    return pd.Series(values[codes], index=series.index)
+
+
+def _period_labels(dates: pd.Series, freq: str, label: Callable[[pd.Period], str]) -> pd.Series:
+    """Bucket label of every date (None for NaT), formatted once per distinct period"""
+    codes, periods = pd.factorize(dates.dt.to_period(freq))
+    labels = np.array([label(period) for period in periods] + [None], dtype=object)
+    return pd.Series(labels[codes], index=dates.index, dtype=object)
+
+
+def month_labels(dates: pd.Series) -> pd.Series:
+    """'MM/YYYY' per date, the key used by the dashboard seasonality"""
+    return _period_labels(dates, 'M', lambda period: f"{period.month:02d}/{period.year}")
+
+
+def week_labels(dates: pd.Series) -> pd.Series:
+    """ISO week ('YYYY-Www', weeks starting on Monday) per date"""
+    def label(period: pd.Period) -> str:
+        year, week, _ = period.start_time.isocalendar()
+        return f"{year}-W{week:02d}"
+    return _period_labels(dates, 'W', label)
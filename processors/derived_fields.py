@@ -0,0 +1,129 @@
+"""
+Derived Field Rules
+Declarative business rules that add calculated columns to a cleaned DataFrame.
+Every rule is evaluated column-wise (NumPy select/where), never row by row
+"""
+
+from typing import Dict, List, Any, Tuple, Callable, Iterable
+import numpy as np
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _numeric(series: pd.Series) -> np.ndarray:
+    """Float view of a column; text and missing values become NaN"""
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+
+class DerivedField:
+    """
+    Column computed from `inputs` by a vectorized function
+    `compute` receives {input column: Series} and returns an array or Series aligned with the frame
+    """
+
+    def __init__(self, name: str, inputs: Iterable[str], compute: Callable[[Dict[str, pd.Series]], Any],
+                 message: str = None):
+        self.name = name
+        self.inputs = tuple(dict.fromkeys(inputs))
+        self.compute = compute
+        self.message = message or f"Campo '{name}' calculado automaticamente"
+
+    def applies_to(self, columns) -> bool:
+        return all(column in columns for column in self.inputs)
+
+    def evaluate(self, df: pd.DataFrame) -> Any:
+        return self.compute({column: df[column] for column in self.inputs})
+
+
+class ThresholdField(DerivedField):
+    """
+    Label from comparing `value` with multiples of `reference`:
+    the first level (factor, label) with value <= reference * factor wins, otherwise `default`;
+    rows where either column is missing get `unknown`
+    """
+
+    def __init__(self, name: str, value: str, reference: str, levels: List[Tuple[float, str]],
+                 default: str, unknown: str = 'DESCONHECIDO', message: str = None):
+        self.value = value
+        self.reference = reference
+        self.levels = list(levels)
+        self.default = default
+        self.unknown = unknown
+        super().__init__(name, (value, reference), self._labels, message)
+
+    def _labels(self, columns: Dict[str, pd.Series]) -> np.ndarray:
+        value = _numeric(columns[self.value])
+        reference = _numeric(columns[self.reference])
+        conditions = [np.isnan(value) | np.isnan(reference)]
+        conditions += [value <= reference * factor for factor, _ in self.levels]
+        choices = [self.unknown] + [label for _, label in self.levels]
+        return np.select(conditions, choices, default=self.default)
+
+
+class PercentField(DerivedField):
+    """(numerator - subtract) / denominator * 100, rounded to `decimals`"""
+
+    def __init__(self, name: str, numerator: str, denominator: str, subtract: str = None,
+                 decimals: int = 2, message: str = None):
+        self.numerator = numerator
+        self.denominator = denominator
+        self.subtract = subtract
+        self.decimals = decimals
+        inputs = (numerator, subtract, denominator) if subtract else (numerator, denominator)
+        super().__init__(name, inputs, self._percent, message)
+
+    def _percent(self, columns: Dict[str, pd.Series]) -> pd.Series:
+        numerator = columns[self.numerator]
+        if self.subtract:
+            numerator = numerator - columns[self.subtract]
+        return (numerator / columns[self.denominator] * 100).round(self.decimals)
+
+
+class DerivedFieldRegistry:
+    """Ordered rules; a rule may use the columns added by the rules before it"""
+
+    def __init__(self, rules: Iterable[DerivedField] = ()):
+        self._rules: "Dict[str, DerivedField]" = {}
+        for rule in rules:
+            self.add(rule)
+
+    def add(self, rule: DerivedField) -> DerivedField:
+        # Adding a rule under an existing name replaces it (e.g. a schema-specific status)
+        if rule.name in self._rules:
+            logger.debug(f"Derived field {rule.name} redefined; replacing it")
+        self._rules[rule.name] = rule
+        return rule
+
+    def remove(self, name: str):
+        self._rules.pop(name, None)
+
+    def names(self) -> List[str]:
+        return list(self._rules)
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Frame with every applicable rule's column added; rules missing an input are skipped"""
+        result = df.copy(deep=False)
+        for rule in list(self._rules.values()):
+            if not rule.applies_to(result.columns):
+                continue
+            try:
+                result[rule.name] = rule.evaluate(result)
+            except Exception as e:
+                logger.warning(f"Could not calculate derived field {rule.name}: {e}")
+                continue
+            logger.info(rule.message)
+        return result
+
+
+# Business rules applied to every upload; add schema-specific rules with DERIVED_FIELDS.add(...)
+DERIVED_FIELDS = DerivedFieldRegistry([
+    ThresholdField('status_estoque_calculado', 'estoque_atual', 'estoque_minimo',
+                   levels=[(1.0, 'CRITICO'), (1.5, 'BAIXO')], default='OK',
+                   message="Campo 'status_estoque_calculado' adicionado baseado na lógica de negócio"),
+    PercentField('margem_real_percentual', 'preco_varejo', 'preco_atacado', subtract='preco_atacado',
+                 decimals=2, message="Campo 'margem_real_percentual' calculado automaticamente"),
+    PercentField('percentual_estoque', 'estoque_atual', 'estoque_maximo', decimals=1,
+                 message="Campos de análise de estoque calculados automaticamente"),
+])
@@ -0,0 +1,62 @@
+"""
+Fast JSON Serialization
+Encodes API payloads with orjson when it is installed, falling back to the standard library
+"""
+
+import json
+import math
+import datetime
+from typing import Any
+import logging
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+MIMETYPE = 'application/json'
+
+
+def orjson_available() -> bool:
+    return orjson is not None
+
+
+def _default(value: Any) -> Any:
+    """Types neither encoder handles natively (numpy scalars, pandas timestamps and missing values)"""
+    if value is None or value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, (pd.Timestamp, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return _default(value.item()) if isinstance(value, np.datetime64) else value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _finite(value: Any) -> Any:
+    """NaN/Infinity become null, as orjson does (the standard library would emit invalid JSON)"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+
+def dumps(payload: Any) -> bytes:
+    """
+    Compact UTF-8 JSON for `payload`, keeping dict insertion order
+    Non-string keys are stringified and non-finite floats are written as null
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default,
+                            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(_finite(payload), default=lambda value: _finite(_default(value)),
+                      ensure_ascii=False, separators=(',', ':'), allow_nan=False).encode('utf-8')
@@ -0,0 +1,194 @@
+"""
+Incremental JSON Reading
+Yields the records of a JSON document (or of newline-delimited JSON) one at a time,
+so large exports are never held in memory as a whole document
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Text read from the file per refill
+READ_CHUNK_CHARS = 1024 * 1024
+# A first line longer than this is not taken as a NDJSON record
+NDJSON_SNIFF_CHARS = 1024 * 1024
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Marks an exhausted iterator
+_END = object()
+
+
+class _Reader:
+    """Buffered cursor over a text file that decodes one JSON value at a time"""
+
+    def __init__(self, handle: TextIO, chunk_chars: int = READ_CHUNK_CHARS):
+        self.handle = handle
+        self.chunk_chars = chunk_chars
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        """Append the next chunk, dropping what was already consumed"""
+        if self.eof:
+            return False
+        data = self.handle.read(self.chunk_chars)
+        if not data:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ('' at end of file)"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def take(self, expected: str):
+        char = self.peek()
+        if char != expected:
+            raise ValueError(f"Invalid JSON: expected '{expected}', found {char or 'end of file'!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the complete value starting at the cursor"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Incomplete value: read more, unless there is nothing left to read
+                if not self._fill():
+                    raise
+                continue
+            # A number or literal ending exactly at the buffer end may continue in the next chunk
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def array_items(self) -> Iterator[Any]:
+        """Values of the array starting at the cursor, consumed through its ']'"""
+        self.take('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f"Invalid JSON: expected ',' or ']' in array, found {char or 'end of file'!r}")
+
+
+def _object_records(reader: _Reader) -> Iterator[Any]:
+    """
+    Records of a top-level object: the items of its first non-empty list value,
+    or the object itself when it has none (a single record)
+    """
+    reader.take('{')
+    fields: Dict[str, Any] = {}
+    if reader.peek() == '}':
+        reader.pos += 1
+        yield fields
+        return
+    while True:
+        key = reader.value()
+        reader.take(':')
+        if reader.peek() == '[':
+            items = reader.array_items()
+            first = next(items, _END)
+            if first is not _END:
+                # The main record array: stream it and ignore whatever follows
+                yield first
+                yield from items
+                return
+            fields[key] = []
+        else:
+            fields[key] = reader.value()
+        char = reader.peek()
+        reader.pos += 1
+        if char == '}':
+            yield fields
+            return
+        if char != ',':
+            raise ValueError(f"Invalid JSON: expected ',' or '}}' in object, found {char or 'end of file'!r}")
+
+
+def is_ndjson(path: str, encoding: str = 'utf-8') -> bool:
+    """
+    Newline-delimited JSON: by extension, or a first line that is a complete value
+    followed by another value on the next non-empty line
+    """
+    if path.lower().endswith(NDJSON_EXTENSIONS):
+        return True
+    with open(path, 'r', encoding=encoding) as handle:
+        first = handle.readline(NDJSON_SNIFF_CHARS)
+        if not first.endswith('\n'):
+            return False
+        try:
+            json.loads(first)
+        except json.JSONDecodeError:
+            return False
+        for line in handle:
+            if line.strip():
+                return line.lstrip()[:1] in ('{', '[')
+    return False
+
+
+def iter_ndjson(path: str, encoding: str = 'utf-8') -> Iterator[Any]:
+    """One value per non-empty line"""
+    with open(path, 'r', encoding=encoding) as handle:
+        for number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on line {number}: {e}")
+
+
+def iter_records(path: str, encoding: str = 'utf-8', ndjson: Optional[bool] = None) -> Iterator[Any]:
+    """
+    Records of a JSON file, read incrementally
+    A top-level array yields its items; a top-level object yields the items of its
+    first non-empty list (or itself); NDJSON yields one record per line
+    """
+    if ndjson is None:
+        ndjson = is_ndjson(path, encoding)
+    if ndjson:
+        yield from iter_ndjson(path, encoding)
+        return
+    with open(path, 'r', encoding=encoding) as handle:
+        reader = _Reader(handle)
+        first = reader.peek()
+        if first == '[':
+            yield from reader.array_items()
+        elif first == '{':
+            yield from _object_records(reader)
+        else:
+            raise ValueError("Unsupported JSON structure")
+
+
+def batched(records: Iterator[Any], size: int) -> Iterator[List[Any]]:
+    """Group records into lists of at most `size`"""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
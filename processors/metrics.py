@@ -0,0 +1,200 @@
+"""
+Runtime Metrics
+Request counters and latency histograms rendered in the Prometheus text exposition format
+"""
+
+import bisect
+import threading
+import time
+from typing import Dict, List, Any, Tuple, Callable, Iterable, Iterator
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upper bounds (seconds) of the latency buckets, from sub-millisecond stages to multi-second uploads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[Any, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in values]
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label combination"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label combination: [count per bucket (last one is +Inf), sum]
+        self._series: Dict[Tuple[Any, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues):
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][position] += 1
+            series[1] += value
+
+    def time(self, *labelvalues) -> "Timer":
+        return Timer(self, labelvalues)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        lines = []
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                bucket = _labels(self.labelnames, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Timer:
+    """Context manager observing the elapsed wall time into a histogram"""
+
+    __slots__ = ('histogram', 'labelvalues', 'started')
+
+    def __init__(self, histogram: Histogram, labelvalues: Tuple[Any, ...]):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labelvalues)
+        return False
+
+
+class Collected:
+    """Gauge or counter whose samples are read from a callback when metrics are rendered"""
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Any],
+                 labelnames: Tuple[str, ...] = (), kind: str = 'gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+        self._callback = callback
+
+    def samples(self) -> List[str]:
+        values = self._callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f"{self.name}{_labels(self.labelnames, key if isinstance(key, tuple) else (key,))} {_number(value)}"
+                for key, value in values.items()]
+
+
+class MetricsRegistry:
+    """Named metrics of this process, rendered together for /metrics"""
+
+    def __init__(self):
+        self._metrics: "Dict[str, Any]" = {}
+
+    def _register(self, metric):
+        # Re-registering (e.g. the server module imported again) replaces the previous metric
+        if metric.name in self._metrics:
+            logger.debug(f"Metric {metric.name} registered again; replacing it")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def collect(self, name: str, documentation: str, callback: Callable[[], Any],
+                labelnames: Tuple[str, ...] = (), kind: str = 'gauge') -> Collected:
+        """
+        Metric computed on demand: `callback` returns a number, or {label value(s): number}
+        """
+        return self._register(Collected(name, documentation, callback, labelnames, kind))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                logger.warning(f"Could not collect metric {metric.name}: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry shared by the server and the processors
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram('datahub_stage_duration_seconds',
+                                   'Duration of upload, aggregation and response stages', ('stage',))
+
+
+def stage(name: str) -> Timer:
+    """`with stage('parse'):` records the block's duration under that stage"""
+    return Timer(STAGE_SECONDS, (name,))
+
+
+def timed_iter(iterable: Iterable, name: str) -> Iterator:
+    """Yield from `iterable`, recording the time spent producing each item as stage `name`"""
+    iterator = iter(iterable)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        STAGE_SECONDS.observe(time.perf_counter() - started, name)
+        yield item
@@ -0,0 +1,49 @@
+"""
+Top-K Rankings
+Selects the largest entries of an aggregated metric with a partial selection instead of a full sort
+"""
+
+import numpy as np
+from typing import Dict, List, Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RANKING_SIZE = 10
+MAX_RANKING_SIZE = 1000
+
+
+def top_k(values: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the `k` largest values, largest first
+
+    Same order as a stable descending sort (ties keep their original order, NaN ranks last)
+    but O(n + k log k): np.partition finds the k-th largest value and only the entries that
+    make the cut are sorted.
+    """
+    n = len(values)
+    k = max(0, min(int(k), n))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    keys = np.where(np.isnan(values), -np.inf, values) if values.dtype.kind == 'f' else values
+    if k < n:
+        threshold = np.partition(keys, n - k)[n - k]
+        above = np.flatnonzero(keys > threshold)
+        # Of the entries equal to the threshold, the first ones in original order make the cut
+        tied = np.flatnonzero(keys == threshold)[:k - len(above)]
+        positions = np.concatenate((above, tied))
+    else:
+        positions = np.arange(n)
+    # Descending by value, ascending by position among ties
+    return positions[np.lexsort((positions, -keys[positions]))]
+
+
+def build_ranking(names: List[Any], columns: Dict[str, np.ndarray], metric: str, k: int) -> List[Dict[str, Any]]:
+    """Top `k` entities by `metric`, each with its position and every available metric"""
+    ranking = []
+    for place, position in enumerate(top_k(columns[metric], k).tolist(), start=1):
+        entry = {"posicao": place, "nome": names[position]}
+        for column, values in columns.items():
+            entry[column] = values[position].item()
+        ranking.append(entry)
+    return ranking
@@ -0,0 +1,216 @@
+"""
+Upload Jobs
+Runs upload parsing and aggregation on a background worker pool and tracks each job's progress
+"""
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Callable, Optional, Tuple, BinaryIO
+import logging
+
+from processors import columnar_files
+from processors.metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Parallel uploads; parsing and aggregation spend most of their time in pandas/numpy, outside the GIL
+DEFAULT_UPLOAD_WORKERS = int(os.environ.get('DATAHUB_UPLOAD_WORKERS', min(4, os.cpu_count() or 1)))
+
+# Bytes copied per read while saving (and hashing) an upload
+SAVE_CHUNK_BYTES = 1024 * 1024
+
+QUEUED = 'na_fila'
+RUNNING = 'processando'
+DONE = 'concluido'
+FAILED = 'erro'
+
+
+def save_stream(stream: BinaryIO, path: str, chunk_bytes: int = SAVE_CHUNK_BYTES) -> Tuple[str, int]:
+    """Copy an upload to disk, hashing it on the way; returns (sha256 hex digest, size)"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'wb') as handle:
+        for block in iter(lambda: stream.read(chunk_bytes), b''):
+            digest.update(block)
+            handle.write(block)
+            size += len(block)
+    return digest.hexdigest(), size
+
+
+class UploadJob:
+    """State of one upload: current stage, per-stage timings, ingestion progress and outcome"""
+
+    def __init__(self, filename: str, on_change: Optional[Callable[["UploadJob", bool], None]] = None):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        # Where the received file waits to be parsed, and its SHA-256
+        self.filepath: Optional[str] = None
+        self.content_hash: Optional[str] = None
+        self.status = QUEUED
+        self.stage: Optional[str] = None
+        self.stages: "OrderedDict[str, float]" = OrderedDict()
+        self.stats = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now().isoformat()
+        self.finished_at: Optional[str] = None
+        self._stage_started: Optional[float] = None
+        self._on_change = on_change
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def start_stage(self, name: str):
+        """Close the running stage (recording its duration) and open `name`"""
+        self._close_stage()
+        self.status = RUNNING
+        self.stage = name
+        self._stage_started = time.perf_counter()
+        self._changed(True)
+
+    def record_stage(self, name: str, seconds: float):
+        """Record a stage measured elsewhere (e.g. receiving the request body)"""
+        self.stages[name] = round(seconds, 4)
+        STAGE_SECONDS.observe(seconds, 'upload_' + name)
+
+    def progress(self, stats):
+        """Called after every parsed chunk; `stats` is the job's IngestStats"""
+        self.stats = stats
+        self._changed(False)
+
+    def succeed(self, result: Dict[str, Any]):
+        self._close_stage()
+        self.result = result
+        self.status = DONE
+        self.finished_at = datetime.now().isoformat()
+        self._changed(True)
+
+    def fail(self, error: str):
+        self._close_stage()
+        self.error = error
+        self.status = FAILED
+        self.finished_at = datetime.now().isoformat()
+        self._changed(True)
+
+    def _close_stage(self):
+        if self.stage is not None and self._stage_started is not None:
+            seconds = time.perf_counter() - self._stage_started
+            self.stages[self.stage] = round(seconds, 4)
+            STAGE_SECONDS.observe(seconds, 'upload_' + self.stage)
+        self.stage, self._stage_started = None, None
+
+    def _changed(self, important: bool):
+        if self._on_change is not None:
+            self._on_change(self, important)
+
+    def to_dict(self) -> Dict[str, Any]:
+        stages = dict(self.stages)
+        if self.stage is not None and self._stage_started is not None:
+            # Running stage reports its elapsed time so far
+            stages[self.stage] = round(time.perf_counter() - self._stage_started, 4)
+        return {
+            "job_id": self.id,
+            "arquivo": self.filename,
+            "status": self.status,
+            "etapa": self.stage,
+            "etapas": stages,
+            "progresso": self.stats.to_dict() if self.stats is not None else None,
+            "criado_em": self.created_at,
+            "concluido_em": self.finished_at,
+            "resultado": self.result,
+            "erro": self.error
+        }
+
+
+class UploadJobManager:
+    """
+    Thread pool plus registry of upload jobs
+
+    With `state_dir`, job snapshots are also written as JSON files so that, behind several
+    worker processes, `/jobs/<id>` answers on whichever worker receives the poll.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_UPLOAD_WORKERS, state_dir: Optional[str] = None,
+                 keep_finished: int = 200, snapshot_interval: float = 0.5):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upload')
+        self._jobs: "OrderedDict[str, UploadJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.state_dir = state_dir
+        self.keep_finished = keep_finished
+        self.snapshot_interval = snapshot_interval
+        self._last_snapshot: Dict[str, float] = {}
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+
+    def submit(self, filename: str, work: Callable[[UploadJob], Dict[str, Any]],
+               prepare: Optional[Callable[[UploadJob], None]] = None) -> UploadJob:
+        """
+        Register a job and run `work(job)` on the pool; its return value becomes the job result
+        `prepare(job)` runs synchronously first (e.g. to save the request body under the job id)
+        and may finish the job on its own, in which case nothing is queued
+        """
+        job = UploadJob(filename, on_change=self._snapshot)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict()
+        if prepare is not None:
+            try:
+                prepare(job)
+            except Exception as e:
+                job.fail(str(e))
+                raise
+        self._snapshot(job, True)
+        if not job.finished:
+            self._executor.submit(self._run, job, work)
+        return job
+
+    def _run(self, job: UploadJob, work: Callable[[UploadJob], Dict[str, Any]]):
+        try:
+            job.succeed(work(job))
+            logger.info(f"Upload job {job.id} ({job.filename}) done: {dict(job.stages)}")
+        except Exception as e:
+            logger.exception(f"Upload job {job.id} ({job.filename}) failed")
+            job.fail(str(e))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Current job state, from this process or from another worker's snapshot"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self.state_dir and all(c in '0123456789abcdef' for c in job_id):
+            return columnar_files.read_json(self._snapshot_path(job_id))
+        return None
+
+    def _snapshot_path(self, job_id: str) -> str:
+        return os.path.join(self.state_dir, job_id + '.json')
+
+    def _snapshot(self, job: UploadJob, important: bool):
+        if not self.state_dir:
+            return
+        # Per-chunk progress is throttled; stage changes and completion are always written
+        now = time.monotonic()
+        if not important and now - self._last_snapshot.get(job.id, 0) < self.snapshot_interval:
+            return
+        self._last_snapshot[job.id] = now
+        try:
+            columnar_files.write_json(job.to_dict(), self._snapshot_path(job.id))
+        except OSError as e:
+            logger.warning(f"Could not write snapshot of job {job.id}: {e}")
+
+    def _evict(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+            self._last_snapshot.pop(job_id, None)
+            if self.state_dir:
+                columnar_files.remove_file(self._snapshot_path(job_id))
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -1,297 +1,448 @@
 # MVP DataHub - Backend Simples e Funcional
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
 import pandas as pd
+import numpy as np
 import os
+import itertools
+import threading
+import time
+import zlib
 from datetime import datetime
 from collections import OrderedDict
+from processors.dataset_store import DatasetStore
+from processors.dashboard_engine import aggregate_dataset, DatasetAggregates, DashboardAggregates, to_float, AGGREGATES_VERSION, CUBE_DIMENSIONS, RANKING_DIMENSIONS, RANKING_METRICS
+from processors.csv_stream import read_csv_chunks, IngestStats, DEFAULT_CHUNK_ROWS
+from processors.upload_jobs import UploadJob, UploadJobManager, save_stream
+from processors.data_query import DatasetIndex, QueryError, parse_filters, query_dataset, DEFAULT_PAGE_SIZE
+from processors.rankings import top_k, build_ranking, DEFAULT_RANKING_SIZE, MAX_RANKING_SIZE
+from processors import columnar_files, fast_json, metrics
+from processors.columnar_files import ArrowChunkWriter
 
 app = Flask(__name__)
 CORS(app)
 
-# Storage simples em memória
-uploaded_data = {}
+# Cópia persistente dos datasets em Arrow IPC (vazio desativa); recarregada via mmap ao iniciar
+DIRETORIO_DATASETS = os.environ.get('DATAHUB_DATASET_DIR', os.path.join('uploads', '.datasets'))
 
-# Funções auxiliares para detecção de colunas
-def detectar_coluna_valor(dados):
+# Limite de memória dos DataFrames carregados, em MB (vazio/0 = sem limite); acima dele os
+# arquivos menos usados vão para disco e são remapeados via mmap quando voltam a ser consultados
+ORCAMENTO_MEMORIA_MB = float(os.environ.get('DATAHUB_MEMORY_BUDGET_MB') or 0)
+
+# Storage colunar em memória (um DataFrame por arquivo)
+dataset_store = DatasetStore(persist_dir=DIRETORIO_DATASETS or None,
+                             memory_budget=int(ORCAMENTO_MEMORIA_MB * 1024 * 1024) or None)
+
+# Agregados do dashboard mantidos a cada upload (não recalculados por requisição).
+# Nunca alterados depois de publicados: uploads trabalham numa cópia e trocam a referência
+dashboard_aggregates = DashboardAggregates()
+
+# Uploads processados em segundo plano; estado dos jobs compartilhado entre workers via disco
+upload_jobs = UploadJobManager(state_dir=os.path.join(DIRETORIO_DATASETS, 'jobs') if DIRETORIO_DATASETS else None)
+
+# Última resposta serializada por endpoint/query, válida enquanto a geração dos dados não mudar
+# (LRU: cada combinação de filtros do dashboard é uma variante)
+respostas_cache = OrderedDict()
+MAX_RESPOSTAS_CACHE = 256
+# Requisições concorrentes (threads do Flask/gunicorn) leem e reordenam o mesmo OrderedDict
+respostas_cache_lock = threading.Lock()
+
+# Métricas do processo expostas em /metrics (formato Prometheus); etapas internas usam metrics.stage
+REQUISICOES = metrics.REGISTRY.counter('datahub_http_requests_total', 'Requisições HTTP atendidas',
+                                       ('endpoint', 'method', 'status'))
+LATENCIA_REQUISICOES = metrics.REGISTRY.histogram('datahub_http_request_duration_seconds',
+                                                  'Latência das requisições HTTP', ('endpoint',))
+
+# Dica de formatação enviada com ?format=raw (números sem formatação; percentuais de 0 a 100)
+FORMATO_NUMEROS = {"moeda": "BRL", "simbolo": "R$", "locale": "pt-BR", "casas_decimais": 2, "percentuais": "0-100"}
+
+def resposta_condicional(gerar_resposta):
+    """
+    GET condicional por geração dos dados: 304 se o cliente já tem a versão atual
+    (If-None-Match / If-Modified-Since), senão reaproveita o JSON já serializado
+    `gerar_resposta` recebe o snapshot do store cuja geração identifica a resposta
+    """
+    dados = dataset_store.snapshot()
+    # A geração recomeça em 0 a cada store novo (ex.: restart sem persistência): a época o distingue
+    geracao = (dados.epoch, dados.generation)
+    variante = f"{request.endpoint}?{request.query_string.decode('utf-8', 'replace')}"
+    etag = f"{dados.epoch}-{dados.generation}-{zlib.crc32(variante.encode('utf-8')):08x}"
+    ultima_modificacao = dados.modified_at.replace(microsecond=0)
+    
+    # RFC 9110: com If-None-Match presente, If-Modified-Since é ignorado
+    if request.if_none_match:
+        nao_modificado = request.if_none_match.contains_weak(etag)
+    else:
+        desde = request.if_modified_since
+        # Last-Modified tem precisão de 1 s: se a geração anterior saiu no mesmo segundo,
+        # quem tem exatamente esse segundo pode estar com a versão anterior
+        nao_modificado = desde is not None and ultima_modificacao <= desde and \
+            not (dados.shares_second and ultima_modificacao == desde)
+    
+    if nao_modificado:
+        resposta = app.response_class(status=304)
+    else:
+        with respostas_cache_lock:
+            cache = respostas_cache.get(variante)
+            if cache and cache[0] == geracao:
+                respostas_cache.move_to_end(variante)
+        if cache and cache[0] == geracao:
+            resposta = app.response_class(cache[1], mimetype='application/json')
+        else:
+            # Gerada fora do lock: respostas lentas não seguram as demais
+            resposta = gerar_resposta(dados)
+            if isinstance(resposta, tuple):
+                # Erros não entram no cache nem recebem ETag
+                return resposta
+            with respostas_cache_lock:
+                respostas_cache[variante] = (geracao, resposta.get_data())
+                respostas_cache.move_to_end(variante)
+                while len(respostas_cache) > MAX_RESPOSTAS_CACHE:
+                    respostas_cache.popitem(last=False)
+    
+    resposta.set_etag(etag)
+    resposta.last_modified = ultima_modificacao
+    resposta.headers['Cache-Control'] = 'no-cache'
+    return resposta
+
+# Funções auxiliares para detecção de colunas (operam sobre o schema de cada DataFrame)
+def detectar_coluna_valor(df):
     """Detecta automaticamente a coluna de valores monetários"""
-    for linha in dados:
-        for col in linha.keys():
-            col_lower = col.lower()
-            if any(palavra in col_lower for palavra in ['valor_total', 'valor', 'vendas', 'receita', 'mrr', 'contrato']):
-                try:
-                    float(linha[col])
-                    return col
-                except:
-                    continue
-    return None
+    candidatas = [col for col in df.columns
+                  if any(palavra in str(col).lower() for palavra in ['valor_total', 'valor', 'vendas', 'receita', 'mrr', 'contrato'])]
+    if not candidatas or len(df) == 0:
+        return None
+    # Primeira linha em que alguma candidata converte para float; nela, a primeira candidata válida
+    validas = np.column_stack([to_float(df[col])[1] for col in candidatas])
+    linhas_validas = validas.any(axis=1)
+    if not linhas_validas.any():
+        return None
+    primeira_linha = int(np.argmax(linhas_validas))
+    return candidatas[int(np.argmax(validas[primeira_linha]))]
 
-def detectar_coluna_regiao(dados):
+def detectar_coluna_regiao(df):
     """Detecta automaticamente a coluna de região/localização"""
-    for linha in dados:
-        for col in linha.keys():
-            col_lower = col.lower()
-            # Priorizar cidade_filial para vendas
-            if 'cidade_filial' in col_lower:
-                return col
-        # Segunda passagem para outras colunas
-        for col in linha.keys():
-            col_lower = col.lower()
-            if any(palavra in col_lower for palavra in ['regiao', 'estado', 'cidade']):
-                return col
+    # Priorizar cidade_filial para vendas
+    for col in df.columns:
+        if 'cidade_filial' in str(col).lower():
+            return col
+    # Segunda passagem para outras colunas
+    for col in df.columns:
+        if any(palavra in str(col).lower() for palavra in ['regiao', 'estado', 'cidade']):
+            return col
     return None
 
-def detectar_coluna_produto(dados):
+def detectar_coluna_produto(df):
     """Detecta automaticamente a coluna de produtos (prioriza nome_produto)"""
-    for linha in dados:
-        for col in linha.keys():
-            col_lower = col.lower()
-            if 'nome_produto' in col_lower:
-                return col
-        # Segunda passagem para outras colunas se nome_produto não existir
-        for col in linha.keys():
-            col_lower = col.lower()
-            if any(palavra in col_lower for palavra in ['produto', 'item', 'categoria']) and 'id_produto' not in col_lower:
-                return col
+    for col in df.columns:
+        if 'nome_produto' in str(col).lower():
+            return col
+    # Segunda passagem para outras colunas se nome_produto não existir
+    for col in df.columns:
+        col_lower = str(col).lower()
+        if any(palavra in col_lower for palavra in ['produto', 'item', 'categoria']) and 'id_produto' not in col_lower:
+            return col
     return None
 
-def detectar_coluna_vendedor(dados):
+def detectar_coluna_vendedor(df):
     """Detecta automaticamente a coluna de vendedores"""
-    for linha in dados:
-        for col in linha.keys():
-            if 'vendedor' in col.lower():
-                return col
+    for col in df.columns:
+        if 'vendedor' in str(col).lower():
+            return col
     return None
 
-def detectar_coluna_data(dados):
+def detectar_coluna_data(df):
     """Detecta automaticamente a coluna de data"""
-    for linha in dados:
-        for col in linha.keys():
-            if 'data' in col.lower():
-                return col
+    for col in df.columns:
+        if 'data' in str(col).lower():
+            return col
     return None
 
-# Funções de cálculo de métricas
-def calcular_vendas_por_regiao(dados, col_regiao, col_valor):
-    """Calcula vendas por região"""
-    vendas_por_regiao = {}
-    for linha in dados:
-        regiao = linha.get(col_regiao, 'Outros')
-        try:
-            valor = float(linha.get(col_valor, 0))
-            if regiao not in vendas_por_regiao:
-                vendas_por_regiao[regiao] = 0
-            vendas_por_regiao[regiao] += valor
-        except:
-            continue
-    return vendas_por_regiao
-
-def calcular_vendas_por_produto(dados, col_produto, col_valor):
-    """Calcula vendas e quantidade por produto"""
-    vendas_por_produto = {}
-    quantidade_por_produto = {}
-    for linha in dados:
-        produto = linha.get(col_produto, 'Item')
-        try:
-            valor = float(linha.get(col_valor, 0))
-            quantidade = int(linha.get('quantidade', 0))
-            
-            if produto not in vendas_por_produto:
-                vendas_por_produto[produto] = 0
-                quantidade_por_produto[produto] = 0
-            
-            vendas_por_produto[produto] += valor
-            quantidade_por_produto[produto] += quantidade
-        except:
-            continue
-    return vendas_por_produto, quantidade_por_produto
-
-def calcular_vendas_por_vendedor(dados, col_vendedor, col_valor):
-    """Calcula vendas por vendedor"""
-    vendas_por_vendedor = {}
-    for linha in dados:
-        vendedor = linha.get(col_vendedor)
-        if vendedor and col_valor:
-            try:
-                valor = float(linha.get(col_valor, 0))
-                if vendedor not in vendas_por_vendedor:
-                    vendas_por_vendedor[vendedor] = 0
-                vendas_por_vendedor[vendedor] += valor
-            except:
-                continue
-    return vendas_por_vendedor
-
-def calcular_canais(dados, col_valor):
-    """Detecta e calcula vendas por canal (atacado/varejo)"""
-    canais = {}
-    for linha in dados:
-        canal = None
-        if 'vendedor' in linha and linha.get('vendedor'):
-            canal = 'Varejo'
-        elif 'vendedor_responsavel' in linha and linha.get('vendedor_responsavel'):
-            canal = 'Atacado'
-        elif 'estoque_atual' in linha or 'meta_mensal' in linha:
-            continue
-        else:
-            canal = 'Outros'
-            
-        if canal and col_valor:
-            if canal not in canais:
-                canais[canal] = {'total': 0, 'transacoes': 0}
-            try:
-                valor = float(linha.get(col_valor, 0))
-                if valor > 0:
-                    canais[canal]['total'] += valor
-                    canais[canal]['transacoes'] += 1
-            except:
-                continue
-    
-    # Calcular tickets médios
-    for canal in canais:
-        if canais[canal]['transacoes'] > 0:
-            canais[canal]['ticket_medio'] = canais[canal]['total'] / canais[canal]['transacoes']
+DETECTORES_COLUNA = {
+    'valor': detectar_coluna_valor,
+    'regiao': detectar_coluna_regiao,
+    'produto': detectar_coluna_produto,
+    'vendedor': detectar_coluna_vendedor,
+    'data': detectar_coluna_data
+}
+
+def detectar_papeis(df):
+    """Mapa de papéis (valor/regiao/produto/vendedor/data) de um arquivo, resolvido só pelo schema"""
+    # Arquivos sem linhas não participam da detecção
+    if len(df) == 0:
+        return {papel: None for papel in DETECTORES_COLUNA}
+    return {papel: detector(df) for papel, detector in DETECTORES_COLUNA.items()}
+
+def resolver_colunas(mapas_papeis):
+    """Resolve cada papel de coluna no primeiro arquivo (em ordem de upload) que o possui"""
+    mapas_papeis = list(mapas_papeis)
+    colunas = {}
+    for papel in DETECTORES_COLUNA:
+        colunas[papel] = next((mapa[papel] for mapa in mapas_papeis if mapa.get(papel)), None)
+    return colunas
+
+def publicar_agregados(agregados):
+    """
+    Troca os agregados do dashboard de uma vez (chamado com o lock do store)
+    Requisições em andamento seguem com a versão que já pegaram, sem lock na leitura
+    """
+    global dashboard_aggregates
+    dashboard_aggregates = agregados
+
+def reconstruir_agregados(colunas, parciais):
+    """Substitui todos os agregados e guarda a contribuição de cada arquivo para reinícios"""
+    agregados = DashboardAggregates()
+    agregados.rebuild(colunas, parciais)
+    publicar_agregados(agregados)
+    for nome, parcial in parciais.items():
+        if nome in dataset_store:
+            dataset_store.set_aggregates(nome, parcial, colunas)
+
+def recalcular_agregados():
+    """Refaz os agregados de todos os arquivos se os papéis de coluna resolvidos mudaram"""
+    colunas = resolver_colunas(dataset_store.role_maps())
+    if colunas != dashboard_aggregates.roles:
+        parciais = OrderedDict((nome, aggregate_dataset(dataset.frame, colunas)) for nome, dataset in dataset_store.items())
+        reconstruir_agregados(colunas, parciais)
+
+def restaurar_agregados():
+    """Ao iniciar, reaproveita os agregados persistidos; só relê arquivos cujos papéis mudaram"""
+    colunas = resolver_colunas(dataset_store.role_maps())
+    parciais = OrderedDict()
+    for nome, dataset in dataset_store.items():
+        parcial = dataset.aggregates
+        if parcial is None or getattr(parcial, 'version', None) != AGGREGATES_VERSION or dataset.aggregate_roles != colunas:
+            parcial = aggregate_dataset(dataset.frame, colunas)
+            dataset_store.set_aggregates(nome, parcial, colunas)
+        parciais[nome] = parcial
+    agregados = DashboardAggregates()
+    agregados.rebuild(colunas, parciais)
+    publicar_agregados(agregados)
+
+def registrar_dataset(filename, df, papeis=None, parcial=None, colunas_parcial=None, indice=None, hash_conteudo=None,
+                      arquivo=None):
+    """
+    Armazena o arquivo e atualiza os agregados do dashboard apenas com a contribuição dele
+    (`parcial` é reaproveitado se já foi calculado com os mesmos papéis resolvidos;
+    `arquivo` é a cópia em Arrow gravada durante a ingestão, adotada pelo store sem regravar)
+    """
+    papeis = papeis if papeis is not None else detectar_papeis(df)
+    # Lock entre processos: papéis e agregados são resolvidos sobre o catálogo mais recente
+    with dataset_store.exclusive():
+        mapas = OrderedDict((nome, dataset.roles) for nome, dataset in dataset_store.items())
+        mapas[filename] = papeis
+        colunas = resolver_colunas(mapas.values())
+        if parcial is None or colunas != colunas_parcial:
+            parcial = aggregate_dataset(df, colunas)
+        
+        # Agregar antes de publicar: se falhar, store e agregados continuam consistentes.
+        # Os agregados são atualizados antes do store para que a nova geração já os encontre prontos.
+        if colunas != dashboard_aggregates.roles:
+            # Papéis de coluna mudaram: a contribuição de todos os arquivos depende deles
+            parciais = OrderedDict((nome, aggregate_dataset(dataset.frame, colunas)) for nome, dataset in dataset_store.items())
+            parciais[filename] = parcial
+            reconstruir_agregados(colunas, parciais)
         else:
-            canais[canal]['ticket_medio'] = 0
-    
-    return canais
-
-def calcular_sazonalidade(dados, col_data, col_valor):
-    """Calcula vendas por mês"""
-    vendas_por_mes = {}
-    for linha in dados:
-        data = str(linha.get(col_data, ''))
-        if '/' in data and len(data.split('/')) >= 3:
-            try:
-                mes_ano = f"{data.split('/')[1]}/{data.split('/')[2]}"
-                if mes_ano not in vendas_por_mes:
-                    vendas_por_mes[mes_ano] = 0
-                valor = float(linha.get(col_valor, 0))
-                vendas_por_mes[mes_ano] += valor
-            except:
-                continue
-    return vendas_por_mes
-
-def analisar_estoque(dados, col_produto):
-    """Analisa dados de estoque"""
-    estoque_info = {}
-    valor_total_estoque = 0
+            agregados = dashboard_aggregates.copy()
+            agregados.put(filename, parcial)
+            publicar_agregados(agregados)
+        dataset = dataset_store.add(filename, df, roles=papeis, aggregates=parcial, aggregate_roles=colunas,
+                                    index=indice, content_hash=hash_conteudo, data_file=arquivo)
+    return dataset
+
+def reler_blocos(filepath, chunk_rows, quantidade):
+    """Os primeiros `quantidade` blocos do CSV de novo (já liberados da memória após a leitura)"""
+    blocos = read_csv_chunks(filepath, chunk_rows, sep=';', encoding='utf-8')
+    try:
+        yield from itertools.islice(blocos, quantidade)
+    finally:
+        blocos.close()
+
+def ingerir_csv(filepath, filename, chunk_rows=DEFAULT_CHUNK_ROWS, stats=None, on_chunk=None):
+    """
+    Lê o CSV em blocos de tamanho limitado, detectando papéis e agregando bloco a bloco
+    Cada bloco é gravado em Arrow IPC e liberado; o DataFrame final mapeia o arquivo gravado
+    Retorna (DataFrame, papeis, parcial, colunas usadas no parcial, estatísticas, arquivo)
+    `arquivo` é (caminho, formato) para dataset_store.add, ou None se os dados ficaram em memória
+    """
+    stats = stats if stats is not None else IngestStats(os.path.getsize(filepath))
+    mapas_existentes = [dataset.roles for nome, dataset in dataset_store.items() if nome != filename]
+    chunks, papeis, colunas, parcial = [], None, None, DatasetAggregates()
+    gravador = ArrowChunkWriter(dataset_store.staging_path()) if columnar_files.arrow_available() else None
     
-    for linha in dados:
-        if 'estoque_atual' in linha:
-            nome = linha.get(col_produto, 'Item')
-            atual = int(linha.get('estoque_atual', 0))
-            minimo = int(linha.get('estoque_minimo', 0))
-            preco_varejo = float(linha.get('preco_varejo', 0))
-            margem = float(linha.get('margem_varejo', 0))
-            
-            valor_produto = atual * preco_varejo
-            valor_total_estoque += valor_produto
+    try:
+        blocos = read_csv_chunks(filepath, chunk_rows, stats, on_chunk, sep=';', encoding='utf-8')
+        for chunk in metrics.timed_iter(blocos, 'leitura_csv'):
+            # Papéis vêm do schema; só a coluna de valor pode depender de linhas de blocos seguintes
+            if papeis is None or (papeis['valor'] is None and len(chunk)):
+                with metrics.stage('deteccao_colunas'):
+                    novos = detectar_papeis(chunk)
+                if papeis is None:
+                    papeis = novos
+                else:
+                    papeis['valor'] = novos['valor']
+            colunas_chunk = resolver_colunas(mapas_existentes + [papeis])
+            if colunas_chunk != colunas:
+                # Papéis resolvidos mudaram no meio do arquivo: reagrega os blocos já lidos
+                colunas, parcial = colunas_chunk, DatasetAggregates()
+                for anterior in reler_blocos(filepath, chunk_rows, stats.chunks - 1):
+                    parcial.combine(aggregate_dataset(anterior, colunas))
+            parcial.combine(aggregate_dataset(chunk, colunas))
             
-            estoque_info[nome] = {
-                'atual': atual,
-                'minimo': minimo,
-                'preco_varejo': preco_varejo,
-                'valor_estoque': valor_produto,
-                'status': 'CRÍTICO' if atual < minimo else 'OK',
-                'margem': margem
-            }
+            if gravador is not None:
+                with metrics.stage('gravacao_arrow'):
+                    gravado = gravador.write(chunk)
+                if gravado:
+                    continue
+                # Bloco sem tipos compatíveis com o arquivo: volta a juntar os blocos em memória
+                gravador.abort()
+                gravador = None
+                chunks = list(reler_blocos(filepath, chunk_rows, stats.chunks - 1))
+            chunks.append(chunk)
+        
+        if gravador is not None and gravador.close():
+            df = columnar_files.read_frame(gravador.path, columnar_files.ARROW_FORMAT)
+            return df, papeis, parcial, colunas, stats, (gravador.path, columnar_files.ARROW_FORMAT)
+    except BaseException:
+        if gravador is not None:
+            gravador.abort()
+        raise
     
-    return estoque_info, valor_total_estoque
+    if not chunks:
+        # Arquivo só com cabeçalho: nenhum bloco é gerado
+        chunks = [pd.read_csv(filepath, sep=';', encoding='utf-8')]
+        papeis = detectar_papeis(chunks[0])
+    df = chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+    return df, papeis, parcial, colunas, stats, None
 
-def analisar_metas_vs_vendas(dados, col_valor):
-    """Analisa metas vs vendas reais por filial"""
-    vendas_por_filial = {}
-    metas_por_filial = {}
-    
-    # Calcular vendas por filial
-    for linha in dados:
-        if 'id_filial' in linha and col_valor:
-            filial = linha.get('id_filial')
-            cidade = linha.get('cidade_filial', linha.get('cidade', 'N/A'))
-            try:
-                valor = float(linha.get(col_valor, 0))
-                if filial not in vendas_por_filial:
-                    vendas_por_filial[filial] = {'total': 0, 'cidade': cidade}
-                vendas_por_filial[filial]['total'] += valor
-            except:
-                continue
-    
-    # Obter metas das filiais
-    for linha in dados:
-        if 'meta_mensal' in linha:
-            filial = linha.get('id_filial')
-            cidade = linha.get('cidade', 'N/A')
-            try:
-                meta = float(linha.get('meta_mensal', 0))
-                metas_por_filial[filial] = {'meta': meta, 'cidade': cidade}
-            except:
-                continue
-    
-    # Comparar metas vs vendas
-    resultado = {}
-    for filial in metas_por_filial:
-        meta = metas_por_filial[filial]['meta']
-        cidade = metas_por_filial[filial]['cidade']
-        vendas = vendas_por_filial.get(filial, {}).get('total', 0)
+@app.route('/ping')
+def ping():
+    return jsonify({"status": "MVP Backend funcionando!", "timestamp": datetime.now().isoformat()})
+
+class ConteudoDeOutroArquivo(Exception):
+    """PUT /datasets/<nome> com o mesmo conteúdo de outro arquivo já carregado"""
+    def __init__(self, nome, existente):
+        super().__init__(f"Conteúdo idêntico ao arquivo já carregado {existente}; {nome} não foi substituído")
+        self.existente = existente
+
+def duplicado_aceito(filename, existente, substituir):
+    """
+    Upload que repete um conteúdo já carregado: devolve True se pode ser respondido como duplicado
+    Numa substituição só vale se o conteúdo é o do próprio arquivo; de outro, é conflito
+    """
+    if existente is None:
+        return False
+    if substituir and existente.name != filename:
+        raise ConteudoDeOutroArquivo(filename, existente.name)
+    return True
+
+def resultado_duplicado(filename, existente):
+    """Resposta de upload para um arquivo idêntico a um já carregado (nada é reprocessado)"""
+    return {
+        "success": True,
+        "filename": filename,
+        "duplicado_de": existente.name,
+        "rows": existente.rows,
+        "columns": len(existente.column_names),
+        "memory_bytes": existente.memory_bytes,
+        "colunas_detectadas": existente.roles,
+        "preview": existente.frame.head(5).to_dict('records')
+    }
+
+def processar_upload(job, filepath, destino, substituir=False):
+    """Lê, agrega e publica um arquivo recebido, registrando as etapas no job"""
+    arquivo = None
+    try:
+        job.start_stage('leitura')
+        stats = IngestStats(os.path.getsize(filepath))
+        job.progress(stats)
+        # Processar CSV em blocos, agregando cada bloco enquanto lê
+        df, papeis, parcial, colunas_parcial, stats, arquivo = ingerir_csv(filepath, job.filename, stats=stats, on_chunk=job.progress)
         
-        percentual = (vendas / meta * 100) if meta > 0 else 0
-        status = 'ATINGIDA' if vendas >= meta else 'NÃO ATINGIDA'
+        # Índices por coluna para /data, construídos fora do lock do store
+        job.start_stage('indexacao')
+        indice = DatasetIndex(df, [papeis.get('data')])
         
-        resultado[cidade] = {
-            'meta': meta,
-            'vendas': vendas,
-            'percentual': percentual,
-            'status': status,
-            'diferenca': vendas - meta
-        }
+        # Armazenar em memória no formato colunar e atualizar os agregados do dashboard
+        job.start_stage('registro')
+        with dataset_store.exclusive():
+            # Outro upload do mesmo conteúdo pode ter terminado enquanto este era lido
+            existente = dataset_store.find_by_content(job.content_hash)
+            if duplicado_aceito(job.filename, existente, substituir):
+                return resultado_duplicado(job.filename, existente)
+            dataset = registrar_dataset(job.filename, df, papeis, parcial, colunas_parcial, indice, job.content_hash, arquivo)
+        os.replace(filepath, destino)
+    finally:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        # Cópia em Arrow não adotada pelo store (duplicado ou erro)
+        if arquivo is not None:
+            columnar_files.remove_file(arquivo[0])
     
-    return resultado
+    return {
+        "success": True,
+        "filename": job.filename,
+        "rows": dataset.rows,
+        "columns": len(df.columns),
+        "memory_bytes": dataset.memory_bytes,
+        "colunas_detectadas": dataset.roles,
+        "ingestao": stats.to_dict(),
+        "preview": df.head(5).to_dict('records')  # Primeiras 5 linhas
+    }
 
-def listar_todos_produtos(dados, col_produto, col_valor):
-    """Lista todos os produtos vendidos com suas informações"""
-    produtos_completos = {}
+def receber_upload(file, filename, substituir=False):
+    """
+    Grava o arquivo enviado e agenda o processamento; devolve (resposta, status HTTP)
+    Com ?sync=1 processa na própria requisição e devolve o resultado final
+    `substituir` (PUT): conteúdo igual ao de outro arquivo levanta ConteudoDeOutroArquivo
+    """
+    destino = f"uploads/{filename}"
     
-    for linha in dados:
-        # Pular dados de estoque - não são vendas
-        if 'estoque_atual' in linha or 'estoque_minimo' in linha:
-            continue
-            
-        if col_produto and col_valor:
-            produto = linha.get(col_produto, 'Item')
-            try:
-                valor = float(linha.get(col_valor, 0))
-                quantidade = int(linha.get('quantidade', 0))
-                preco_unit = float(linha.get('preco_unitario', 0))
-                
-                # Só processar se tiver valor de venda real e produto válido
-                if valor > 0 and produto != 'Item' and produto.strip():
-                    if produto not in produtos_completos:
-                        produtos_completos[produto] = {
-                            'total_vendas': 0,
-                            'total_quantidade': 0,
-                            'preco_unitario': preco_unit,
-                            'transacoes': 0
-                        }
-                    
-                    produtos_completos[produto]['total_vendas'] += valor
-                    produtos_completos[produto]['total_quantidade'] += quantidade
-                    produtos_completos[produto]['transacoes'] += 1
-                    
-                    # Atualizar preço se necessário
-                    if preco_unit > 0:
-                        produtos_completos[produto]['preco_unitario'] = preco_unit
-                    
-            except:
-                continue
+    def receber(job):
+        inicio = time.perf_counter()
+        # Caminho próprio do job: uploads simultâneos do mesmo nome não se sobrescrevem
+        os.makedirs(os.path.join('uploads', '.jobs'), exist_ok=True)
+        job.filepath = os.path.join('uploads', '.jobs', f"{job.id}.csv")
+        # Hash calculado enquanto o arquivo é gravado: reenvios do mesmo export não são reprocessados
+        job.content_hash, _ = save_stream(file.stream, job.filepath)
+        job.record_stage('recebimento', time.perf_counter() - inicio)
+        existente = dataset_store.find_by_content(job.content_hash)
+        try:
+            duplicado = duplicado_aceito(filename, existente, substituir)
+        except ConteudoDeOutroArquivo:
+            os.remove(job.filepath)
+            raise
+        if duplicado:
+            os.remove(job.filepath)
+            job.succeed(resultado_duplicado(filename, existente))
     
-    return produtos_completos
-
-@app.route('/ping')
-def ping():
-    return jsonify({"status": "MVP Backend funcionando!", "timestamp": datetime.now().isoformat()})
+    if request.args.get('sync') in ('1', 'true'):
+        job = UploadJob(filename)
+        receber(job)
+        if job.finished:
+            return job.result, 200
+        return processar_upload(job, job.filepath, destino, substituir), 200
+    
+    job = upload_jobs.submit(filename, lambda job: processar_upload(job, job.filepath, destino, substituir), prepare=receber)
+    resposta = {
+        "success": True,
+        "job_id": job.id,
+        "filename": filename,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}"
+    }
+    if job.finished:
+        # Arquivo já conhecido: resultado disponível na hora
+        resposta["resultado"] = job.result
+        return resposta, 200
+    return resposta, 202
 
 @app.route('/upload', methods=['POST'])
 def upload_csv():
+    """
+    Recebe o arquivo e devolve um job_id imediatamente (202); leitura e agregação rodam
+    no pool de uploads e o andamento fica em /jobs/<id>. Com ?sync=1 responde só ao final.
+    """
     try:
         if 'file' not in request.files:
             return jsonify({"error": "Nenhum arquivo enviado"}), 400
@@ -300,123 +451,117 @@ def upload_csv():
         if file.filename == '':
             return jsonify({"error": "Nome do arquivo vazio"}), 400
         
-        # Salvar arquivo
-        filename = file.filename
-        filepath = f"uploads/{filename}"
-        
-        # Criar pasta se não existir
-        os.makedirs('uploads', exist_ok=True)
-        file.save(filepath)
-        
-        # Processar CSV
-        df = pd.read_csv(filepath, sep=';', encoding='utf-8')
-        
-        # Converter dados para JSON limpo
-        data_dict = df.to_dict('records')
-        
-        # Armazenar em memória
-        uploaded_data[filename] = {
-            'data': data_dict,
-            'rows': len(df),
-            'columns': len(df.columns),
-            'column_names': df.columns.tolist(),
-            'upload_time': datetime.now().isoformat()
-        }
-        
-        return jsonify({
-            "success": True,
-            "filename": filename,
-            "rows": len(df),
-            "columns": len(df.columns),
-            "preview": data_dict[:5]  # Primeiras 5 linhas
-        })
+        resposta, status = receber_upload(file, file.filename)
+        return jsonify(resposta), status
         
     except Exception as e:
         return jsonify({"error": f"Erro ao processar arquivo: {str(e)}"}), 500
 
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job não encontrado: {job_id}"}), 404
+    return jsonify(job)
+
 @app.route('/dashboard')
 def get_dashboard():
+    return resposta_condicional(gerar_dashboard)
+
+def gerar_dashboard(dados):
     try:
-        if not uploaded_data:
+        if not len(dados):
             return jsonify({"error": "Nenhum arquivo carregado"}), 400
         
-        # Combinar todos os dados
-        todos_dados = []
-        for filename, file_data in uploaded_data.items():
-            todos_dados.extend(file_data['data'])
-        
-        # Detectar colunas automaticamente
-        col_valor = detectar_coluna_valor(todos_dados)
-        col_regiao = detectar_coluna_regiao(todos_dados)
-        col_produto = detectar_coluna_produto(todos_dados)
-        col_vendedor = detectar_coluna_vendedor(todos_dados)
-        col_data = detectar_coluna_data(todos_dados)
+        # Colunas detectadas e métricas já mantidas a cada upload (uma versão só por requisição)
+        agregados = dashboard_aggregates
+        colunas = agregados.roles
+        col_valor = colunas['valor']
+        col_regiao = colunas['regiao']
+        col_produto = colunas['produto']
         
         # Debug das colunas detectadas
-        print(f"DEBUG: col_regiao detectada = {col_regiao}")
-        print(f"DEBUG: col_valor detectada = {col_valor}")
+        app.logger.debug(f"col_regiao detectada = {col_regiao}, col_valor detectada = {col_valor}")
         
-        # Calcular KPIs básicos (só vendas, não estoque)
-        total_vendas = 0
-        total_transacoes = 0
-        
-        if col_valor:
-            for linha in todos_dados:
-                # Pular dados de estoque
-                if 'estoque_atual' in linha or 'estoque_minimo' in linha:
-                    continue
-                try:
-                    valor = float(linha.get(col_valor, 0))
-                    if valor > 0:  # Só contar vendas reais
-                        total_vendas += valor
-                        total_transacoes += 1
-                except:
-                    continue
+        # Filtros (?mes=03/2024&semana=2024-W10&regiao=Recife&vendedor=...&canal=Varejo&produto=...) são
+        # respondidos pelo cubo pré-agregado; estoque e metas continuam globais
+        filtros = {dimensao: request.args.getlist(dimensao) for dimensao in CUBE_DIMENSIONS if request.args.getlist(dimensao)}
+        with metrics.stage('dashboard_metricas'):
+            metricas = agregados.metrics(filtros)
         
+        total_vendas = metricas['total_vendas']
+        total_transacoes = metricas['total_transacoes']
         ticket_medio = total_vendas / total_transacoes if total_transacoes > 0 else 0
         
-        # Calcular métricas usando funções auxiliares  
-        # Filtrar apenas dados de vendas (não estoque) para vendas por região
-        dados_vendas = [linha for linha in todos_dados if 'estoque_atual' not in linha and 'estoque_minimo' not in linha]
-        
-        # Garantir que col_regiao seja sempre 'cidade_filial' para dados de vendas
-        if dados_vendas and not col_regiao:
-            for linha in dados_vendas:
-                if 'cidade_filial' in linha:
-                    col_regiao = 'cidade_filial'
-                    break
-        
-        vendas_por_regiao = calcular_vendas_por_regiao(dados_vendas, col_regiao, col_valor) if col_regiao and col_valor else {}
-        vendas_por_produto, quantidade_por_produto = calcular_vendas_por_produto(todos_dados, col_produto, col_valor) if col_produto and col_valor else ({}, {})
-        vendas_por_vendedor = calcular_vendas_por_vendedor(todos_dados, col_vendedor, col_valor) if col_vendedor and col_valor else {}
-        canais = calcular_canais(todos_dados, col_valor) if col_valor else {}
-        vendas_por_mes = calcular_sazonalidade(todos_dados, col_data, col_valor) if col_data and col_valor else {}
-        estoque_info, valor_total_estoque = analisar_estoque(todos_dados, col_produto) if col_produto else ({}, 0)
-        
-        # Novas análises
-        metas_vs_vendas = analisar_metas_vs_vendas(todos_dados, col_valor) if col_valor else {}
-        todos_produtos = listar_todos_produtos(todos_dados, col_produto, col_valor) if col_produto and col_valor else {}
-        
-        # Organizar tops (ordenados do maior para menor) - usar exata mesma ordenação
-        produtos_ordenados = sorted(todos_produtos.items(), key=lambda x: x[1]['total_vendas'], reverse=True)
-        top_produtos = {k: v for k, v in produtos_ordenados[:5]}
+        vendas_por_regiao = metricas['vendas_por_regiao']
+        vendas_por_vendedor = metricas['vendas_por_vendedor']
+        canais = metricas['canais']
+        vendas_por_mes = metricas['vendas_por_mes']
+        vendas_por_semana = metricas['vendas_por_semana']
+        estoque_info, valor_total_estoque = metricas['estoque'], metricas['valor_estoque']
+        metas_vs_vendas = metricas['metas_vs_vendas']
+        todos_produtos = metricas['todos_produtos']
         
-        # Produtos ordenados por quantidade vendida (para o gráfico de barras)
-        produtos_por_quantidade = sorted(todos_produtos.items(), key=lambda x: x[1]['total_quantidade'], reverse=True)
-        top_produtos_quantidade = {k: v for k, v in produtos_por_quantidade[:5]}
+        with metrics.stage('dashboard_ordenacao'):
+            # Organizar tops (ordenados do maior para menor) - usar exata mesma ordenação
+            produtos_ordenados = sorted(todos_produtos.items(), key=lambda x: x[1]['total_vendas'], reverse=True)
+            top_produtos = {k: v for k, v in produtos_ordenados[:5]}
+            
+            # Top 5 por quantidade vendida (para o gráfico de barras), sem ordenar todos os produtos
+            nomes_produtos = list(todos_produtos)
+            quantidades = np.fromiter((v['total_quantidade'] for v in todos_produtos.values()), np.int64, len(nomes_produtos))
+            top_produtos_quantidade = {nomes_produtos[i]: todos_produtos[nomes_produtos[i]] for i in top_k(quantidades, 5).tolist()}
+            
+            todas_regioes = dict(sorted(vendas_por_regiao.items(), key=lambda x: x[1], reverse=True))
+            top_vendedores = dict(sorted(vendas_por_vendedor.items(), key=lambda x: x[1], reverse=True)[:5])
+            sazonalidade_ordenada = dict(sorted(vendas_por_mes.items(), key=lambda x: x[1], reverse=True))
+            sazonalidade_semanal = dict(sorted(vendas_por_semana.items(), key=lambda x: x[1], reverse=True))
         
-        todas_regioes = dict(sorted(vendas_por_regiao.items(), key=lambda x: x[1], reverse=True))
-        top_vendedores = dict(sorted(vendas_por_vendedor.items(), key=lambda x: x[1], reverse=True)[:5])
-        sazonalidade_ordenada = dict(sorted(vendas_por_mes.items(), key=lambda x: x[1], reverse=True))
+        if request.args.get('format') == 'raw':
+            # Mesma estrutura com números tipados, serializada pelo encoder rápido
+            resposta = {
+                "success": True,
+                "formato": FORMATO_NUMEROS,
+                "kpis": {
+                    "total_vendas": total_vendas,
+                    "total_transacoes": total_transacoes,
+                    "ticket_medio": ticket_medio,
+                    "valor_estoque": valor_total_estoque,
+                    "arquivos_carregados": len(dataset_store),
+                    "colunas_detectadas": f"{col_valor}, {col_regiao}, {col_produto}"
+                },
+                "canais": canais,
+                "estoque": estoque_info,
+                "sazonalidade": sazonalidade_ordenada,
+                "sazonalidade_semanal": sazonalidade_semanal,
+                "vendas_por_regiao": todas_regioes,
+                "top_produtos": {k: {"vendas": v['total_vendas'], "quantidade": v['total_quantidade']} for k, v in top_produtos.items()},
+                "top_produtos_quantidade": [(k, v['total_quantidade']) for k, v in top_produtos_quantidade.items()],
+                "top_vendedores": top_vendedores,
+                "metas_vs_vendas": metas_vs_vendas,
+                # Tabela (colunas + linhas) em vez de um objeto por produto: sem repetir as chaves
+                "todos_produtos": {
+                    "colunas": ["produto", "vendas", "quantidade", "preco_unitario", "transacoes"],
+                    "linhas": [(k, v['total_vendas'], v['total_quantidade'], v['preco_unitario'], v['transacoes'])
+                               for k, v in produtos_ordenados]
+                },
+                "dados_raw": {
+                    "preview": dados.preview(5),
+                    "total_registros": dados.total_rows()
+                },
+                "filtros": filtros
+            }
+            with metrics.stage('serializacao_json'):
+                return app.response_class(fast_json.dumps(resposta), mimetype=fast_json.MIMETYPE)
         
-        return jsonify({
+        resposta = {
             "success": True,
             "kpis": {
                 "total_vendas": f"R$ {total_vendas:,.2f}",
                 "total_transacoes": total_transacoes,
                 "ticket_medio": f"R$ {ticket_medio:,.2f}",
                 "valor_estoque": f"R$ {valor_total_estoque:,.2f}",
-                "arquivos_carregados": len(uploaded_data),
+                "arquivos_carregados": len(dataset_store),
                 "colunas_detectadas": f"{col_valor}, {col_regiao}, {col_produto}"
             },
             "canais": {k: {
@@ -433,6 +578,7 @@ def get_dashboard():
                 "margem": f"{v['margem']:.1f}%"
             } for k, v in estoque_info.items()},
             "sazonalidade": {k: f"R$ {v:,.2f}" for k, v in sazonalidade_ordenada.items()},
+            "sazonalidade_semanal": {k: f"R$ {v:,.2f}" for k, v in sazonalidade_semanal.items()},
             "vendas_por_regiao": {k: f"R$ {v:,.2f}" for k, v in todas_regioes.items()},
             "top_produtos": {k: f"R$ {v['total_vendas']:,.2f} ({v['total_quantidade']} un)" for k, v in top_produtos.items()},
             "top_produtos_quantidade": [(k, v['total_quantidade']) for k, v in top_produtos_quantidade.items()],
@@ -449,30 +595,256 @@ def get_dashboard():
                 "quantidade": v['total_quantidade'],
                 "preco_unitario": f"R$ {v['preco_unitario']:,.2f}",
                 "transacoes": v['transacoes']
-            }) for k, v in sorted(todos_produtos.items(), key=lambda x: x[1]['total_vendas'], reverse=True)],
+            }) for k, v in produtos_ordenados],
             "dados_raw": {
-                "preview": todos_dados[:5],
-                "total_registros": len(todos_dados)
-            }
-        })
+                "preview": dados.preview(5),
+                "total_registros": dados.total_rows()
+            },
+            "filtros": filtros
+        }
+        with metrics.stage('serializacao_json'):
+            return jsonify(resposta)
         
     except Exception as e:
         return jsonify({"error": f"Erro ao gerar dashboard: {str(e)}"}), 500
 
+@app.route('/data')
+def consultar_dados():
+    """
+    Linhas de um arquivo, paginadas e filtradas pelos índices de coluna
+    Parâmetros: arquivo, colunas=a,b, ordenar=col|-col, limite, cursor e filtros
+    <coluna>=valor (repetível) ou <coluna>__gte/__gt/__lte/__lt=valor
+    """
+    params = request.args.to_dict(flat=False)
+    dados = dataset_store.snapshot()
+    nome = params.pop('arquivo', [None])[-1]
+    if nome is None:
+        if len(dados) != 1:
+            return jsonify({"error": "Informe o arquivo", "arquivos": dados.names()}), 400
+        nome = dados.names()[0]
+    if nome not in dados:
+        return jsonify({"error": f"Arquivo não encontrado: {nome}"}), 404
+    dataset = dados.get(nome)
+    
+    colunas = params.pop('colunas', [None])[-1]
+    ordenar = params.pop('ordenar', [None])[-1]
+    limite = params.pop('limite', [DEFAULT_PAGE_SIZE])[-1]
+    cursor = params.pop('cursor', [None])[-1]
+    try:
+        equals, ranges = parse_filters(params, dataset.column_names)
+        pagina = query_dataset(dataset.frame, dataset.index, dataset.token,
+                               columns=colunas.split(',') if colunas else None,
+                               equals=equals, ranges=ranges, sort=ordenar,
+                               limit=int(limite), cursor=cursor)
+    except QueryError as e:
+        return jsonify({"error": str(e)}), 400
+    except ValueError:
+        return jsonify({"error": f"Limite inválido: {limite}"}), 400
+    
+    pagina["arquivo"] = nome
+    return jsonify(pagina)
+
+@app.route('/rankings')
+def get_rankings():
+    return resposta_condicional(gerar_rankings)
+
+def gerar_rankings(dados):
+    """Top-K de produtos, vendedores, regiões ou filiais por receita, quantidade, transações ou ticket"""
+    dimensao = request.args.get('dimensao', 'produto')
+    metrica = request.args.get('metrica', 'receita')
+    if dimensao not in RANKING_DIMENSIONS:
+        return jsonify({"error": f"Dimensão inválida: {dimensao}", "dimensoes": list(RANKING_DIMENSIONS)}), 400
+    if metrica not in RANKING_METRICS:
+        return jsonify({"error": f"Métrica inválida: {metrica}", "metricas": list(RANKING_METRICS)}), 400
+    limite = request.args.get('limite', DEFAULT_RANKING_SIZE)
+    try:
+        limite = max(1, min(int(limite), MAX_RANKING_SIZE))
+    except ValueError:
+        return jsonify({"error": f"Limite inválido: {limite}"}), 400
+    
+    nomes, colunas = dashboard_aggregates.ranking_columns(dimensao)
+    if metrica not in colunas:
+        return jsonify({"error": f"Métrica {metrica} indisponível para {dimensao}", "metricas": list(colunas)}), 400
+    
+    return app.response_class(fast_json.dumps({
+        "dimensao": dimensao,
+        "metrica": metrica,
+        "limite": limite,
+        "total_entidades": len(nomes),
+        "ranking": build_ranking(nomes, colunas, metrica, limite)
+    }), mimetype=fast_json.MIMETYPE)
+
+def remover_dataset(nome):
+    """Tira um arquivo do store subtraindo só a contribuição dele dos agregados"""
+    with dataset_store.exclusive():
+        mapas = [dataset.roles for outro, dataset in dataset_store.items() if outro != nome]
+        colunas = resolver_colunas(mapas)
+        if colunas != dashboard_aggregates.roles:
+            # O arquivo definia algum papel de coluna: os demais precisam ser reagregados
+            parciais = OrderedDict((outro, aggregate_dataset(dataset.frame, colunas))
+                                   for outro, dataset in dataset_store.items() if outro != nome)
+            reconstruir_agregados(colunas, parciais)
+        else:
+            agregados = dashboard_aggregates.copy()
+            agregados.discard(nome)
+            publicar_agregados(agregados)
+        dataset = dataset_store.remove(nome)
+    arquivo = f"uploads/{nome}"
+    if os.path.exists(arquivo):
+        os.remove(arquivo)
+    return dataset
+
+@app.route('/datasets/<path:nome>', methods=['DELETE', 'PUT'])
+def dataset_item(nome):
+    """DELETE remove o arquivo; PUT substitui o conteúdo (multipart 'file', como em /upload)"""
+    if nome not in dataset_store:
+        return jsonify({"error": f"Arquivo não encontrado: {nome}"}), 404
+    
+    try:
+        if request.method == 'DELETE':
+            dataset = remover_dataset(nome)
+            dados = dataset_store.snapshot()
+            return jsonify({
+                "success": True,
+                "removido": nome,
+                "linhas_removidas": dataset.rows,
+                "arquivos_carregados": len(dados),
+                "total_registros": dados.total_rows()
+            })
+        
+        if 'file' not in request.files:
+            return jsonify({"error": "Nenhum arquivo enviado"}), 400
+        resposta, status = receber_upload(request.files['file'], nome, substituir=True)
+        return jsonify(resposta), status
+        
+    except ConteudoDeOutroArquivo as e:
+        return jsonify({"error": str(e), "duplicado_de": e.existente}), 409
+    except KeyError:
+        # Removido por outra requisição/worker entre a checagem e o lock
+        return jsonify({"error": f"Arquivo não encontrado: {nome}"}), 404
+    except Exception as e:
+        return jsonify({"error": f"Erro ao atualizar arquivo: {str(e)}"}), 500
+
+@app.route('/datasets/<path:nome>/roles', methods=['GET', 'PUT'])
+def dataset_roles(nome):
+    if nome not in dataset_store:
+        return jsonify({"error": f"Arquivo não encontrado: {nome}"}), 404
+    
+    if request.method == 'PUT':
+        # Corpo: {"valor": "coluna", "regiao": null, ...}; papéis omitidos voltam à detecção automática
+        overrides = request.get_json(silent=True)
+        if not isinstance(overrides, dict):
+            return jsonify({"error": "Corpo JSON com o mapa de papéis é obrigatório"}), 400
+        invalidos = [papel for papel in overrides if papel not in DETECTORES_COLUNA]
+        if invalidos:
+            return jsonify({"error": f"Papéis inválidos: {invalidos}"}), 400
+        try:
+            with dataset_store.exclusive():
+                dataset_store.set_role_overrides(nome, overrides)
+                recalcular_agregados()
+        except KeyError as e:
+            return jsonify({"error": str(e.args[0])}), 400
+    
+    try:
+        dataset = dataset_store.get(nome)
+    except KeyError:
+        return jsonify({"error": f"Arquivo não encontrado: {nome}"}), 404
+    return jsonify({
+        "arquivo": nome,
+        "detectados": dataset.detected_roles,
+        "overrides": dataset.role_overrides,
+        "efetivos": dataset.roles,
+        "colunas_dashboard": dashboard_aggregates.roles
+    })
+
 @app.route('/status')
 def get_status():
+    return resposta_condicional(gerar_status)
+
+def gerar_status(dados):
+    return jsonify({
+        "arquivos_carregados": len(dados),
+        "arquivos": dados.names(),
+        "total_registros": dados.total_rows(),
+        "memoria_total_bytes": dados.total_memory_bytes(),
+        "datasets": {nome: dataset.summary() for nome, dataset in dados.items()}
+    })
+
+@app.route('/status/cache')
+def get_status_cache():
+    """
+    Contadores do cache de DataFrames e estado de memória de cada arquivo (mudam a cada
+    acesso, despejo ou índice construído, por isso fora do /status condicional)
+    """
+    dados = dataset_store.snapshot()
     return jsonify({
-        "arquivos_carregados": len(uploaded_data),
-        "arquivos": list(uploaded_data.keys()),
-        "total_registros": sum([data['rows'] for data in uploaded_data.values()])
+        **dataset_store.cache.stats(),
+        "carregados": [nome for nome, dataset in dados.items() if dataset.loaded],
+        "datasets": {nome: dataset.residency() for nome, dataset in dados.items()}
     })
 
+@app.route('/metrics')
+def get_metrics():
+    """Contadores e histogramas deste processo no formato de texto do Prometheus"""
+    return app.response_class(metrics.REGISTRY.render(), mimetype=None, content_type=metrics.CONTENT_TYPE)
+
+@app.before_request
+def iniciar_cronometro():
+    g.inicio_requisicao = time.perf_counter()
+
+@app.after_request
+def registrar_requisicao(resposta):
+    # Rota (não a URL) como rótulo, para não criar uma série por nome de arquivo ou job
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'desconhecido'
+    REQUISICOES.inc(endpoint, request.method, str(resposta.status_code))
+    inicio = g.get('inicio_requisicao')
+    if inicio is not None:
+        LATENCIA_REQUISICOES.observe(time.perf_counter() - inicio, endpoint)
+    return resposta
+
+@app.before_request
+def sincronizar_workers():
+    """Com vários workers (ex.: gunicorn -w 4), aplica uploads feitos por outros processos"""
+    dataset_store.sync()
+
+def metricas_datasets(campo):
+    return lambda: {nome: campo(dataset) for nome, dataset in dataset_store.items()}
+
+metrics.REGISTRY.collect('datahub_datasets', 'Arquivos carregados', lambda: len(dataset_store))
+metrics.REGISTRY.collect('datahub_dataset_rows', 'Linhas por arquivo', metricas_datasets(lambda d: d.rows), ('dataset',))
+metrics.REGISTRY.collect('datahub_dataset_bytes', 'Memória do DataFrame de cada arquivo',
+                         metricas_datasets(lambda d: d.memory_bytes), ('dataset',))
+metrics.REGISTRY.collect('datahub_dataset_index_bytes', 'Memória dos índices de /data por arquivo',
+                         metricas_datasets(lambda d: d._index.nbytes if d._index is not None else 0), ('dataset',))
+metrics.REGISTRY.collect('datahub_dataset_loaded', '1 se o DataFrame está em memória',
+                         metricas_datasets(lambda d: int(d.loaded)), ('dataset',))
+metrics.REGISTRY.collect('datahub_cache_resident_bytes', 'Bytes dos DataFrames em memória',
+                         lambda: dataset_store.cache.resident_bytes)
+metrics.REGISTRY.collect('datahub_cache_hits_total', 'Acessos a DataFrames já em memória',
+                         lambda: dataset_store.cache.hits, kind='counter')
+metrics.REGISTRY.collect('datahub_cache_misses_total', 'DataFrames remapeados do disco',
+                         lambda: dataset_store.cache.misses, kind='counter')
+metrics.REGISTRY.collect('datahub_cache_spills_total', 'DataFrames despejados para disco',
+                         lambda: dataset_store.cache.spills, kind='counter')
+
+# Datasets persistidos em execuções anteriores voltam sem reprocessar os CSVs
+restaurar_agregados()
+# Catálogo alterado por outro worker: agregados refeitos a partir dos parciais persistidos
+dataset_store.on_reload(restaurar_agregados)
+
 if __name__ == '__main__':
     print("Iniciando MVP DataHub Backend...")
     print("Servidor rodando em: http://localhost:3001")
     print("Endpoints disponíveis:")
     print("   GET  /ping      - Teste de conectividade")
-    print("   POST /upload    - Upload de CSVs")
+    print("   POST /upload    - Upload de CSVs (assíncrono, retorna job_id)")
+    print("   GET  /jobs/<id> - Andamento de um upload")
     print("   GET  /dashboard - Dashboard com KPIs")
     print("   GET  /status    - Status dos arquivos")
+    print("   GET  /status/cache - Memória e acertos/faltas/despejos do cache de datasets")
+    print("   GET  /data      - Dados brutos paginados e filtrados")
+    print("   GET  /rankings  - Top-K por dimensão e métrica")
+    print("   GET  /metrics   - Métricas no formato Prometheus")
+    print("   PUT/DELETE /datasets/<nome> - Substitui ou remove um arquivo")
+    print("   GET/PUT /datasets/<nome>/roles - Papéis de coluna por arquivo")
     app.run(debug=True, port=3001, host='0.0.0.0')
\ No newline at end of file